@@ -0,0 +1,37 @@
+"""
+The benchmarks of pytsa.bench for pytest-benchmark, run with `pytest benchmarks/`. Compare runs with the
+--benchmark-autosave and --benchmark-compare options of pytest-benchmark
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from pytsa import bench  # noqa: E402
+
+CASES = bench.cases()
+
+
+def test_undecorated(benchmark):
+    benchmark(bench._target, 1)
+
+
+@pytest.mark.parametrize('name, rule, decorator, val', CASES,
+                         ids=['{}-{}'.format(name, rule) for name, rule, _, _ in CASES])
+def test_call(benchmark, name, rule, decorator, val):
+    benchmark(decorator(bench._target), val)
+
+
+@pytest.mark.parametrize('depth', bench.STACK_DEPTHS)
+def test_stacked(benchmark, depth):
+    benchmark(bench.stacked(depth), *(1,) * 8)
+
+
+@pytest.mark.parametrize('lazy', [False, True], ids=['eager', 'lazy'])
+def test_import(benchmark, lazy):
+    benchmark.extra_info['us_per_function'] = benchmark.pedantic(bench.measure_import, args=(10000, 1, lazy),
+                                                                 rounds=1)
+
+
+def test_memory(benchmark):
+    for name, size in benchmark.pedantic(bench.measure_memory, rounds=1):
+        benchmark.extra_info['bytes_per_function ' + name] = size
@@ -1,3 +1,4 @@
+from ._base_rule import enable, disable, set_lazy, compile_all, registry_stats
 from .sa_bool import sa_bool
 from .sa_number import sa_number
 from .sa_type import sa_type
@@ -5,6 +6,10 @@ from .sa_int import sa_int
 from .sa_float import sa_float
 from .sa_string import sa_string
 from .sa_list import sa_list
-from .sa_path import sa_path
+from .sa_path import sa_path, PathValidationTimeout
+from .sa_paths import sa_paths, InvalidPaths
+from .profiling import stats
 
-__all__ = ['sa_bool', 'sa_number', 'sa_type', 'sa_int', 'sa_float', 'sa_string', 'sa_list', 'sa_path']
+__all__ = ['sa_bool', 'sa_number', 'sa_type', 'sa_int', 'sa_float', 'sa_string', 'sa_list', 'sa_path', 'sa_paths',
+           'PathValidationTimeout', 'InvalidPaths', 'enable', 'disable', 'set_lazy', 'compile_all',
+           'registry_stats', 'stats']
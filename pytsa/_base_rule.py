@@ -1,62 +1,701 @@
+import fractions
+import functools
+import hashlib
 import inspect
+import itertools
+import linecache
+import math
 import os
+import random
+import re
+import sys
+import threading
+import types
+import weakref
 
-from decorator import decorator
+from pytsa import profiling, sampling
 
+# Coroutine functions and async generators are new in Python 3.5 and 3.6. pytsa.aio is only imported once one of them
+# is decorated, as it does not compile on older versions
+_iscoroutinefunction = getattr(inspect, 'iscoroutinefunction', lambda func: False)
+_isasyncgenfunction = getattr(inspect, 'isasyncgenfunction', lambda func: False)
 
-def new_rule(rule_name, rule_types_name, rule_rules, type_checker):
-    def sa_rule(arg_name, **rules):
+# The cost classes of checks, from cheap to expensive: constant time, linear in the size of the value, matching a
+# regular expression and making a system call. Cheaper checks run first, so invalid values are rejected early
+CONSTANT, LINEAR, REGEX, SYSCALL = range(4)
+
+
+class Check(object):
+    """
+    A rule check which is inlined in the generated validator. invalid is a python expression on 'val' which is true
+    when the value does not abide by the rule, names between braces in it refer to the given values. error is called
+    with the value to create the exception raised in that case. cost is the cost class of the check
+    """
+
+    # Checks which block on a system call are awaited through pytsa.aio.run_blocking in coroutine functions
+    blocking = False
+
+    def __init__(self, invalid, error, cost=CONSTANT, **values):
+        self.invalid = invalid
+        self.error = error
+        self.cost = cost
+        self.values = values
+
+
+class _Contract(object):
+    """The type and rules a single decorator applies to a single argument"""
+
+    def __init__(self, rule_name, rule_types_name, arg_name, allow_none, type_checker, type_values, checks, rules,
+                 sample_rate=None, check_names=None):
+        self.rule_name = rule_name
+        self.rule_types_name = rule_types_name
+        self.arg_name = arg_name
+        self.allow_none = allow_none
+        self.type_checker = type_checker
+        self.type_values = type_values
+        self.checks = checks
+        self.rules = rules
+        self.sample_rate = sample_rate
+        # The name of the rule of every check, as reported by pytsa.profiling
+        self.check_names = check_names or [str(index) for index in range(len(checks))]
+        # The estimated memory of the contract, set when it is registered to be shared
+        self.size = 0
+
+    def __str__(self):
+        rules = ''.join(', {}={!r}'.format(rule, self.rules[rule]) for rule in self.rules)
+        if self.allow_none:
+            rules += ', allow_none=True'
+        if self.sample_rate is not None:
+            rules += ', sample_rate={!r}'.format(self.sample_rate)
+        return '{}({!r}{})'.format(self.rule_name, self.arg_name, rules).replace('\n', ' ')
+
+
+class _Wrapped(object):
+    """
+    The original function and contracts behind a pytsa wrapper. The code of validator is swapped with pass-through code
+    of the same signature to disable the checks at runtime, so a disabled wrapper does not check a flag on every call.
+    Until it is compiled, the validator has the code of a stub compiling it on the first call
+    """
+
+    def __init__(self, func, contracts, wrapper, validator, signature):
+        self.func = func
+        # Contracts, or in lazy mode functions building them
+        self.contracts = contracts
+        self.wrapper = wrapper
+        self.validator = validator
+        self.signature = signature
+        self.code = validator.__code__
+        self.source = None
+        self.passthrough = _passthrough_code(func)
+        # Set by enable or disable for this function only, None follows the module
+        self.enabled = None
+
+    def compile(self):
+        """builds the contracts and compiles the validator, if that was not done yet"""
+        if self.source is not None:
+            return
+        with _compile_lock:
+            if self.source is not None:
+                return
+            contracts = [contract if isinstance(contract, _Contract) else contract() for contract in self.contracts]
+            # The stub and the compiled validator share their globals, so the code of one can replace the other
+            code, source = _compile(self.func, self.signature, contracts, self.validator.__globals__)
+            with _scopes_lock:
+                self.contracts = contracts
+                self.code = code
+                self.source = source
+                self.wrapper.__pytsa_source__ = source
+                self.apply()
+
+    def recompile(self):
+        """compiles the validator again if it was compiled, for instance when profiling is started or stopped"""
+        with _compile_lock:
+            if self.source is not None:
+                self.source = None
+                self.compile()
+
+    def apply(self):
+        """swap in the validating or pass-through code, according to the enabled state of the function"""
+        with _scopes_lock:
+            enabled = self.enabled
+            if enabled is None:
+                enabled = _module_enabled(getattr(self.func, '__module__', None))
+            code = self.code if enabled else self.passthrough
+            if self.validator.__code__ is not code:
+                self.validator.__code__ = code
+
+
+# All wrappers which can be enabled and disabled, and the enabled state of modules, '' being all modules
+_registry = weakref.WeakSet()
+_scopes = {}
+_scopes_lock = threading.RLock()
+# Code objects shared by all validators
+_codes = {}
+# Compiling a validator can call other validators which are not compiled yet, such as those of rule values
+_compile_lock = threading.RLock()
+_lazy = os.environ.get('PYTSA_LAZY', 'False') == 'True'
+# Contracts shared by all decorators with the same rules, and how often and how much memory sharing them saved
+_contracts = weakref.WeakValueDictionary()
+_contracts_lock = threading.Lock()
+_reused = 0
+_bytes_saved = 0
+
+
+def set_lazy(lazy=True):
+    """
+    In lazy mode, decorators applied afterwards only record their rules. The rules are checked and the validator is
+    compiled on the first call of the function, or by compile_all
+    """
+    global _lazy
+    _lazy = lazy
+
+
+def compile_all():
+    """Compiles the validators of all decorated functions which are not compiled yet, for instance before forking"""
+    for wrapped in list(_registry):
+        wrapped.compile()
+
+
+def _contract_key(rule_name, arg_name, rules):
+    """
+    Returns the key of a contract in the registry, or None if a rule value cannot be hashed. Values are told apart by
+    type and repr as well, so True and 1, or 0.0 and -0.0, do not share a contract
+    """
+    key = [rule_name, arg_name]
+    for rule, value in rules.items():
+        # allow_none=False is the same as leaving it out
+        if rule != 'allow_none' or value is not False:
+            key.append((rule, type(value), value, repr(value)))
+    key = tuple(key)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+_CELL_TYPE = type((lambda val: lambda: val)(None).__closure__[0])
+_PATTERN_TYPE = type(re.compile(''))
+
+
+def _size(contract):
+    """Returns an estimate in bytes of the memory used by a contract, its checks and the closures and regexes of them"""
+    seen = set()
+    size = 0
+    objects = [contract, contract.__dict__, contract.rules, contract.checks] + contract.checks
+    while objects:
+        obj = objects.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, Check):
+            objects += [obj.__dict__, obj.values, obj.error] + list(obj.values.values())
+        elif isinstance(obj, types.FunctionType):
+            objects += list(obj.__closure__ or ())
+        elif isinstance(obj, _CELL_TYPE):
+            objects.append(obj.cell_contents)
+        elif isinstance(obj, _PATTERN_TYPE):
+            size += sys.getsizeof(obj.pattern)
+    return size
+
+
+def registry_stats():
+    """
+    Returns statistics of the contracts shared between decorators with the same rules: the number of distinct contracts
+    in use, how many decorators reused an existing contract, and an estimate of the bytes saved by doing so
+    """
+    with _contracts_lock:
+        return {
+            'distinct_validators': len(_contracts),
+            'reused': _reused,
+            'bytes_saved': _bytes_saved,
+            'distinct_code': _compile_source.cache_info().currsize,
+        }
+
+
+def _shared_contract(key, build):
+    """Returns the contract registered under key, or registers the contract returned by build"""
+    global _reused, _bytes_saved
+    if key is None:
+        return build()
+    with _contracts_lock:
+        contract = _contracts.get(key)
+        if contract is not None:
+            _reused += 1
+            _bytes_saved += contract.size
+            return contract
+    contract = build()
+    contract.size = _size(contract)
+    with _contracts_lock:
+        # Another thread may have built the same contract meanwhile, the first one registered is shared
+        return _contracts.setdefault(key, contract)
+
+
+def recompile_all():
+    """Compiles the validators of all decorated functions which are compiled again"""
+    for wrapped in list(_registry):
+        wrapped.recompile()
+
+
+def _signature(func):
+    """Returns the signature of func itself, not of the function it wraps"""
+    if sys.version_info < (3, 5):
+        # follow_wrapped is new in Python 3.5, before it the signature of a function is taken from its code
+        return inspect.Signature.from_function(func)
+    return inspect.signature(func, follow_wrapped=False)
+
+
+def _first_call(wrapped, args, kw):
+    wrapped.compile()
+    return wrapped.validator(*args, **kw)
+
+
+def _stub_code(func):
+    """Returns the code of the validator of func until it is compiled"""
+    if _iscoroutinefunction(func) or _isasyncgenfunction(func):
+        key = 'stub_async'
+        source = 'async def _sa_rule(*args, **kw):\n    return await _first_call(_wrapped, args, kw)\n'
+    else:
+        key, source = 'stub', 'def _sa_rule(*args, **kw):\n    return _first_call(_wrapped, args, kw)\n'
+    if key not in _codes:
+        module = compile(source, '<pytsa>', 'exec')
+        _codes[key] = next(const for const in module.co_consts if isinstance(const, types.CodeType))
+    return _codes[key]
+
+
+def _passthrough_code(func):
+    """Returns the code of a validator for func which calls the function without any checks"""
+    if _iscoroutinefunction(func):
+        key, source = 'async', 'async def _sa_rule(*args, **kw):\n    return await _func(*args, **kw)\n'
+    elif _isasyncgenfunction(func):
+        key, source = 'async_gen', 'async def _sa_rule(*args, **kw):\n    return _func(*args, **kw)\n'
+    else:
+        key, source = 'sync', 'def _sa_rule(*args, **kw):\n    return _func(*args, **kw)\n'
+    if key not in _codes:
+        module = compile(source, '<pytsa>', 'exec')
+        _codes[key] = next(const for const in module.co_consts if isinstance(const, types.CodeType))
+    return _codes[key]
+
+
+def _module_enabled(module):
+    name = module or ''
+    while True:
+        if name in _scopes:
+            return _scopes[name]
+        if not name:
+            return True
+        name = name.rpartition('.')[0]
+
+
+def _in_scope(module, scope):
+    return not scope or module == scope or (module or '').startswith(scope + '.')
+
+
+def _set_enabled(target, enabled):
+    with _scopes_lock:
+        if target is None or isinstance(target, (str, types.ModuleType)):
+            scope = '' if target is None else getattr(target, '__name__', target)
+            # The most recent call decides for the whole scope, including modules and functions in it
+            for key in [key for key in _scopes if _in_scope(key, scope)]:
+                del _scopes[key]
+            _scopes[scope] = enabled
+            for wrapped in list(_registry):
+                if _in_scope(getattr(wrapped.func, '__module__', None), scope):
+                    wrapped.enabled = None
+                    wrapped.apply()
+            return
+
+        wrapped = getattr(target, '__pytsa__', None)
+        if wrapped is None:
+            raise ValueError('{} is not decorated by pytsa'.format(target))
+        wrapped.enabled = enabled
+        wrapped.apply()
+
+
+def enable(target=None):
+    """
+    Enables the checks of all decorated functions, of all functions in a module or package given by name or module
+    object, or of a single decorated function. Takes effect on functions which are already decorated
+    """
+    _set_enabled(target, True)
+
+
+def disable(target=None):
+    """
+    Disables the checks of all decorated functions, of all functions in a module or package given by name or module
+    object, or of a single decorated function. Disabled functions call the original function directly
+    """
+    _set_enabled(target, False)
+
+
+def _bind_argument(signature, arg_name, rule_types_name):
+    """
+    Find how the argument arg_name is passed to a function with the given signature, returns a tuple of the positional
+    index (or None for keyword-only arguments), the keyword (or None for positional-only arguments) and the default
+    value (or inspect.Parameter.empty)
+    """
+    for index, parameter in enumerate(signature.parameters.values()):
+        if parameter.name != arg_name or parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        positional = parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)
+        return (index if positional else None, arg_name if parameter.kind != parameter.POSITIONAL_ONLY else None,
+                parameter.default)
+    raise ValueError(
+        '{} argument name \'{}\' not found in argument specification'.format(rule_types_name, arg_name))
+
+
+def _type_error(rule_types_name, arg_name, val):
+    return TypeError('{} argument \'{}\' with value {} was of type {}, not of type \'{}\''.format(
+        rule_types_name, arg_name, val, type(val), rule_types_name))
+
+
+def _literal(value):
+    """Returns the source of value if it can be inlined as a literal, None otherwise"""
+    if type(value) not in (int, float, str, bytes, bool, type(None)):
+        return None
+    if type(value) is float and not math.isfinite(value):
+        # nan and inf have no literal
+        return None
+    return repr(value)
+
+
+def _contract_source(contract, index, binding, namespace, awaitable, call, profile=None):
+    """
+    Returns the source lines validating the argument of a single contract, in the body of the validator. binding is
+    the result of _bind_argument, the number of positional arguments is in _n
+    """
+    position, key, default = binding
+    lines = ['    # {}'.format(contract)]
+    if position is not None:
+        lines.append('    if _n > {}:'.format(position))
+        lines.append('        val = args[{}]'.format(position))
+    if key is not None:
+        lines.append('    {} {!r} in kw:'.format('if' if position is None else 'elif', key))
+        lines.append('        val = kw[{!r}]'.format(key))
+    lines.append('    else:')
+    if default is inspect.Parameter.empty:
+        # The function raises the error for the missing argument
+        lines.append('        ' + call)
+    else:
+        default_source = _literal(default)
+        if default_source is None:
+            default_source = '_default_{}'.format(index)
+            namespace[default_source] = default
+        lines.append('        val = ' + default_source)
+    return lines + _value_source(contract, index, namespace, awaitable, '    ', profile)
+
+
+def _value_source(contract, index, namespace, awaitable=False, indent='', profile=None):
+    """
+    Returns the source lines validating val according to a single contract, values they use are added to namespace.
+    With profile, the name of the function, the lines record the time spent on every rule in pytsa.profiling
+    """
+    keys = fail = None
+    lines = []
+    if profile is not None:
+        keys = [repr((profile, contract.arg_name, name)) for name in contract.check_names]
+        type_key = repr((profile, contract.arg_name, 'type'))
+        fail = '_fail(_c, {{}}, _t, _start, {!r}, val)'.format((profile, None, None))
+        lines.append(indent + '_t = _clock()')
+    if contract.allow_none:
+        # If the value is None, no other checks are executed
+        lines.append(indent + 'if val is not None:')
+        indent += '    '
+    else:
+        lines.append(indent + 'if val is None:')
+        if profile is not None:
+            lines.append(indent + '    ' + fail.format(type_key))
+        lines.append(indent + '    raise ValueError({!r})'.format(
+            '{} argument \'{}\' was None'.format(contract.rule_types_name, contract.arg_name)))
+
+    namespace['_type_error'] = _type_error
+    type_test = contract.type_checker
+    if callable(type_test):
+        namespace['_type_{}'.format(index)] = type_test
+        type_test = '_type_{}(val)'.format(index)
+    elif contract.type_values:
+        refs = {}
+        for key, value in contract.type_values.items():
+            refs[key] = '_type_{}_{}'.format(index, key)
+            namespace[refs[key]] = value
+        type_test = type_test.format(**refs)
+    lines.append(indent + 'if not ({}):'.format(type_test))
+    if profile is not None:
+        lines.append(indent + '    ' + fail.format(type_key))
+    lines.append(indent + '    raise _type_error({!r}, {!r}, val)'.format(contract.rule_types_name, contract.arg_name))
+    if profile is not None:
+        lines.append(indent + '_t = _tick(_c, {}, _t, val)'.format(type_key))
+
+    return lines + _checks_source(contract.checks, '_rule_{}'.format(index), indent, namespace, awaitable, keys, fail)
+
+
+def _checks_source(checks, prefix, indent, namespace, awaitable=False, keys=None, fail=None):
+    """
+    Returns the source lines running all checks on val in order, values they use are added to namespace. With
+    awaitable, blocking checks are awaited on the executor of pytsa.aio. With keys, the profiling key of every check,
+    the time spent on every check is recorded, and fail is the line recording a failed check
+    """
+    lines = []
+    for check_index, check in enumerate(checks):
+        name = '{}_{}'.format(prefix, check_index)
+        if not isinstance(check, Check):
+            # A function which raises an exception itself if the value does not abide by the rule
+            namespace[name] = check
+            if awaitable and getattr(check, 'blocking', False):
+                from pytsa import aio
+                namespace['_run_blocking'] = aio.run_blocking
+                call = 'await _run_blocking({}, val)'.format(name)
+            else:
+                call = '{}(val)'.format(name)
+            if keys is None:
+                lines.append(indent + call)
+                continue
+            lines.append(indent + 'try:')
+            lines.append(indent + '    ' + call)
+            lines.append(indent + 'except BaseException:')
+            lines.append(indent + '    ' + fail.format(keys[check_index]))
+            lines.append(indent + '    raise')
+            lines.append(indent + '_t = _tick(_c, {}, _t, val)'.format(keys[check_index]))
+            continue
+
+        refs = {}
+        for key, value in check.values.items():
+            refs[key] = _literal(value)
+            if refs[key] is None:
+                refs[key] = '{}_{}'.format(name, key)
+                namespace[refs[key]] = value
+        namespace[name + '_error'] = check.error
+        lines.append(indent + 'if {}:'.format(check.invalid.format(**refs)))
+        if keys is not None:
+            lines.append(indent + '    ' + fail.format(keys[check_index]))
+        lines.append(indent + '    raise {}_error(val)'.format(name))
+        if keys is not None:
+            lines.append(indent + '_t = _tick(_c, {}, _t, val)'.format(keys[check_index]))
+    return lines
+
+
+def compile_checks(checks):
+    """Returns a function running all checks on a single value in order, for rules checking values themselves"""
+    namespace = {}
+    lines = ['def _check(val):'] + _checks_source(checks, '_rule', '    ', namespace) + ['    return']
+    exec(compile('\n'.join(lines) + '\n', '<pytsa>', 'exec'), namespace)
+    return namespace['_check']
+
+
+def _sample_source(rate, call, namespace):
+    """Returns the source lines which call the function without validating it, for all calls which are not sampled"""
+    if sampling.mode() == sampling.RANDOM:
+        namespace['_random'] = random.random
+        return ['    # sample_rate={!r}, random'.format(rate),
+                '    if _random() >= {!r}:'.format(rate),
+                '        ' + call]
+    namespace['_calls'] = itertools.count()
+    if rate == 0:
+        return ['    # sample_rate=0', '    next(_calls)', '    ' + call]
+    # Call n is validated when ceil((n + 1) * rate) > ceil(n * rate), so the first call and exactly numerator of every
+    # denominator calls are, spread evenly. The rate is taken as the decimal it was written as, 0.1 is 1/10
+    fraction = fractions.Fraction(repr(rate))
+    numerator, denominator = fraction.numerator, fraction.denominator
+    if numerator == 1:
+        return ['    # sample_rate={!r}, every {} calls'.format(rate, denominator),
+                '    if next(_calls) % {}:'.format(denominator),
+                '        ' + call]
+    return ['    # sample_rate={!r}, {} of every {} calls'.format(rate, numerator, denominator),
+            '    if (next(_calls) * {} - 1) % {} < {}:'.format(numerator, denominator, denominator - numerator),
+            '        ' + call]
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_source(source):
+    """
+    compiles the source of a wrapper, functions with the same contracts and signature share the code. Returns the code
+    of the module, the lines of the source and a digest of it
+    """
+    digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]
+    return compile(source, '<pytsa>', 'exec'), source.splitlines(True), digest
+
+
+def _function_name(func):
+    return '{}.{}'.format(getattr(func, '__module__', None), getattr(func, '__qualname__', func.__name__))
+
+
+def _rename_code(code, filename, func):
+    """Returns a copy of code with the given file name and the name of func"""
+    if not hasattr(code, 'replace'):
+        # CodeType.replace is new in Python 3.8, up to 3.7 the constructor takes these arguments
+        return types.CodeType(code.co_argcount, code.co_kwonlyargcount, code.co_nlocals, code.co_stacksize,
+                              code.co_flags, code.co_code, code.co_consts, code.co_names, code.co_varnames, filename,
+                              func.__name__, code.co_firstlineno, code.co_lnotab, code.co_freevars, code.co_cellvars)
+    names = {'co_filename': filename, 'co_name': func.__name__}
+    if hasattr(code, 'co_qualname'):
+        names['co_qualname'] = getattr(func, '__qualname__', func.__name__)
+    return code.replace(**names)
+
+
+def _compile(func, signature, contracts, namespace):
+    """
+    Generates the source of the wrapper of func, which checks all contracts in order before calling func with the
+    arguments as they were passed. Returns the code of the wrapper, using the values in namespace, and its source. For
+    coroutine functions and async generators the wrapper is a coroutine function, which returns the result of the
+    coroutine or the async generator itself
+    """
+    awaitable = _iscoroutinefunction(func) or _isasyncgenfunction(func)
+    lines = ['{}def _sa_rule(*args, **kw):'.format('async ' if awaitable else '')]
+    call = 'return await _func(*args, **kw)' if _iscoroutinefunction(func) else 'return _func(*args, **kw)'
+
+    # A sample rate given to any of the decorators applies to the whole function, the highest one is used
+    rates = [contract.sample_rate for contract in contracts if contract.sample_rate is not None]
+    rate = max(rates) if rates else sampling.rate_for(getattr(func, '__module__', None))
+    if rate is not None and rate < 1:
+        lines += _sample_source(rate, call, namespace)
+
+    profile = None
+    if profiling.enabled():
+        profile = _function_name(func)
+        namespace.update(_counters=profiling.counters, _clock=profiling._clock, _tick=profiling.tick,
+                         _fail=profiling.fail)
+        lines += ['    _c = _counters()', '    _start = _clock()']
+
+    # Where every argument is found is planned here, so the call needs no binding of the arguments to the signature
+    bindings = [_bind_argument(signature, contract.arg_name, contract.rule_types_name) for contract in contracts]
+    if any(position is not None for position, _, _ in bindings):
+        lines.append('    _n = len(args)')
+    for index, contract in enumerate(contracts):
+        lines += _contract_source(contract, index, bindings[index], namespace, awaitable, call, profile)
+    if profile is not None:
+        lines.append('    _tick(_c, {!r}, _start)'.format((profile, None, None)))
+    lines.append('    ' + call)
+    source = '\n'.join(lines) + '\n'
+
+    module_code, source_lines, digest = _compile_source(source)
+    exec(module_code, namespace)
+    code = namespace.pop('_sa_rule').__code__
+
+    # Every wrapper gets a file name and name of its own, with its source in linecache, for profilers and tracebacks.
+    # The digest of the source keeps functions with the same name but other contracts apart in linecache
+    filename = '<pytsa:{}:{}>'.format(_function_name(func), digest)
+    linecache.cache[filename] = (len(source), None, source_lines, filename)
+    return _rename_code(code, filename, func), source
+
+
+def _wrap(func, contracts):
+    """
+    Returns a signature preserving wrapper of func which validates all contracts in order before calling func. Unless
+    the contracts are still to be built in lazy mode, the validator is compiled right away
+    """
+    signature = _signature(func)
+    namespace = {'_type_error': _type_error, '_func': func, '_first_call': _first_call}
+    validator = types.FunctionType(_stub_code(func), namespace, '_sa_rule')
+    wrapper = validator
+    if _isasyncgenfunction(func):
+        # The arguments are checked on the first iteration, when an async generator starts running
+        from pytsa import aio
+        wrapper = aio.async_gen_wrapper(validator)
+
+    functools.update_wrapper(wrapper, func)
+    # Copied from func when it wraps another pytsa wrapper, the source is set once the validator is compiled
+    wrapper.__dict__.pop('__pytsa_source__', None)
+    wrapper.__signature__ = signature
+    wrapped = _Wrapped(func, contracts, wrapper, validator, signature)
+    namespace['_wrapped'] = wrapped
+    wrapper.__pytsa__ = wrapped
+    with _scopes_lock:
+        _registry.add(wrapped)
+        wrapped.apply()
+    if all(isinstance(contract, _Contract) for contract in contracts):
+        wrapped.compile()
+    return wrapper
+
+
+def _identity(func):
+    return func
+
+
+def _order_by_cost(checks, check_names):
+    """
+    Returns the checks and their names ordered by the cost class of the checks. Checks of the same class keep the order
+    their rules were given in, so the same value always fails on the same rule
+    """
+    order = sorted(range(len(checks)), key=lambda index: getattr(checks[index], 'cost', CONSTANT))
+    return [checks[index] for index in order], [check_names[index] for index in order]
+
+
+def new_rule(rule_name, rule_types_name, rule_rules, type_checker, planner=None, type_values=None):
+    """
+    Creates a new decorator. rule_rules maps every rule name to a function taking the argument name and rule value,
+    returning a Check, a function raising an exception for invalid values, or None if nothing has to be checked.
+    Functions can have a cost attribute with their cost class, like Check. type_checker is a python expression on 'val'
+    which is true if the value is of the correct type, names between braces in it refer to type_values. planner is an
+    optional function taking the argument name and list of checks, returning the checks to run in their place. The
+    checks run in order of their cost class after planning
+    """
+
+    def contract(arg_name, **rules):
         """
-        Ensures the given parameter is of type int and not None, and abides by all given rules
+        Returns the contract of the argument arg_name with the given rules. Contracts with the same rules are built once
+        and shared, they are not changed after they are built
         """
+        return _shared_contract(_contract_key(rule_name, arg_name, rules), lambda: _build(arg_name, rules))
+
+    def _build(arg_name, rules):
         allow_none = rules.get('allow_none', False)
         rules.pop('allow_none', None)
+        sample_rate = rules.pop('sample_rate', None)
+        if sample_rate is not None:
+            sampling.check_rate(sample_rate)
 
-        rule_funcs = []
+        checks = []
+        names = {}
         for rule in rules:
             if not rule in rule_rules:
                 raise ValueError('rule \'{}\' is unknown for {}'.format(rule, rule_name))
-            rule_funcs.append(rule_rules[rule](arg_name, rules[rule]))
+            check = rule_rules[rule](arg_name, rules[rule])
+            # Rules which are turned off do not need to be checked at all
+            if check is not None:
+                checks.append(check)
+                names[id(check)] = rule
+        planned = checks
+        if planner is not None:
+            planned = planner(arg_name, checks)
+        # A check the planner put in place of other checks is named after all rules it replaced
+        replaced = '+'.join(names[id(check)] for check in checks if not any(check is other for other in planned))
+        check_names = [names.get(id(check), replaced) for check in planned]
+        planned, check_names = _order_by_cost(planned, check_names)
+        return _Contract(rule_name, rule_types_name, arg_name, allow_none, type_checker, type_values, planned, rules,
+                         sample_rate, check_names)
+
+    def sa_rule(arg_name, **rules):
+        """
+        Ensures the given parameter is of type int and not None, and abides by all given rules
+        """
+        # Like assert statements, decorators are stripped under python -O unless PYTSA_KEEP_UNDER_OPTIMIZE is set
+        if not __debug__ and os.environ.get('PYTSA_KEEP_UNDER_OPTIMIZE', 'False') != 'True':
+            return _identity
+
+        if _lazy:
+            # The rules are only checked when the validator is compiled
+            arg_contract = functools.partial(contract, arg_name, **rules)
+        else:
+            arg_contract = contract(arg_name, **rules)
 
         # If environment variable PYTSA_DISABLED is set, return the original function
         if os.environ.get('PYTSA_DISABLED', 'False') == 'True':
-            # Don't use @decorator as it creates a copy of the method with the same signature
-            def _a(func):
-                return func
-
-            return _a
-
-        @decorator
-        def _sa_rule(func, *args, **kw):
-            func_spec = inspect.getfullargspec(func)
-            args_spec = func_spec.args
-            kwargs_spec = func_spec.kwonlyargs
-            val = None
-
-            if arg_name in args_spec:
-                arg_index = args_spec.index(arg_name)
-                val = args[arg_index]
-            elif arg_name in kwargs_spec:
-                val = kw[arg_name]
-            else:
-                raise ValueError(
-                    '{} argument name \'{}\' not found in argument specification'.format(rule_types_name, arg_name))
-
-            if not allow_none and val is None:
-                raise ValueError('{} argument \'{}\' was None'.format(rule_types_name, arg_name))
+            # Return the function itself, not a wrapper with the same signature
+            return _identity
 
-            if val is not None:
-                if not type_checker(val):
-                    raise TypeError(
-                        '{} argument \'{}\' with value {} was of type {}, not of type \'{}\''.format(rule_types_name,
-                                                                                                     arg_name, val,
-                                                                                                     type(val),
-                                                                                                     rule_types_name))
-                for rule_func in rule_funcs:
-                    rule_func(val)
+        def _decorate(func):
+            # When stacking decorators, merge into the existing wrapper. The outer decorator is applied last but
+            # its checks run first
+            contracts = [arg_contract]
+            wrapped = getattr(func, '__pytsa__', None)
+            if wrapped is not None and wrapped.wrapper is func:
+                contracts += wrapped.contracts
+                func = wrapped.func
 
-            return func(*args, **kw)
+            return _wrap(func, contracts)
 
-        return _sa_rule
+        return _decorate
 
+    sa_rule.contract = contract
     return sa_rule
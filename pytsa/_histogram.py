@@ -0,0 +1,61 @@
+"""
+Log-linear latency histograms in the style of HdrHistogram. Every power of two of nanoseconds is split into SUB_BUCKETS
+buckets, so a time is counted with a relative error of at most 1/SUB_BUCKETS, from 0ns up to MAX_NS. A histogram is a
+fixed size array of counts, so histograms of threads or processes are merged by adding them up
+"""
+import array
+import math
+
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+# About 68 seconds, longer times are counted in the last bucket
+MAX_NS = (1 << 36) - 1
+
+
+def index(ns):
+    """Returns the index of the bucket counting ns"""
+    if ns < 2 * SUB_BUCKETS:
+        return ns if ns > 0 else 0
+    if ns > MAX_NS:
+        ns = MAX_NS
+    shift = ns.bit_length() - SUB_BITS - 1
+    return (shift << SUB_BITS) + (ns >> shift)
+
+
+def upper_bound(bucket):
+    """Returns the highest time in ns counted by a bucket"""
+    if bucket < 2 * SUB_BUCKETS:
+        return bucket
+    shift = (bucket >> SUB_BITS) - 1
+    return ((bucket - (shift << SUB_BITS) + 1) << shift) - 1
+
+
+SIZE = index(MAX_NS) + 1
+
+
+def new():
+    """Returns an empty histogram"""
+    return array.array('Q', bytes(8 * SIZE))
+
+
+def merge(into, histogram):
+    """Adds the counts of histogram to into"""
+    for bucket, count in enumerate(histogram):
+        if count:
+            into[bucket] += count
+
+
+def sparse(histogram):
+    """Returns the counts of a histogram as a dict of the upper bound in ns of every bucket which is not empty"""
+    return dict((upper_bound(bucket), count) for bucket, count in enumerate(histogram) if count)
+
+
+def percentile(histogram, percent):
+    """Returns the upper bound in ns of the bucket holding the given percentile of a histogram, 0 if it is empty"""
+    rank = math.ceil(sum(histogram) * percent / 100)
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if count and seen >= rank:
+            return upper_bound(bucket)
+    return 0
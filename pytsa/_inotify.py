@@ -0,0 +1,69 @@
+"""Minimal inotify bindings through ctypes, used by pytsa.stat_cache to invalidate cached paths on Linux"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+
+# Everything that can change whether a path exists, its type or its permissions
+WATCH_MASK = IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify(object):
+    """
+    An inotify instance with a daemon thread reading its events, callback is called with the watch descriptor, mask
+    and name of every event. Raises an OSError if inotify is not available
+    """
+
+    def __init__(self, callback):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._callback = callback
+        self._thread = threading.Thread(target=self._read_events, name='pytsa-inotify')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def close(self):
+        """closes the inotify instance in a forked process, where the thread reading its events does not run"""
+        os.close(self._fd)
+
+    def _read_events(self):
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except InterruptedError:
+                continue
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                self._callback(wd, mask, name)
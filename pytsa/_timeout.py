@@ -0,0 +1,123 @@
+"""
+Runs the stat of a path on helper threads for the timeout rule of sa_path, and remembers the mounts on which a stat
+timed out so later checks on them fail fast instead of blocking another thread. A mount stays hung for as long as the
+stat which timed out is still blocked on it, so at most one thread is blocked on a hung mount after it is noticed
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Seconds a mount on which a stat timed out is considered hung
+HUNG_MOUNT_TTL = 10
+
+_MOUNTS = '/proc/self/mounts'
+
+
+class _Pool(object):
+    """
+    Daemon threads running the submitted calls, started when no thread is idle. Unlike a ThreadPoolExecutor, a thread
+    blocked on a hung mount does not keep the interpreter from exiting
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = 0
+        self._idle = 0
+
+    def submit(self, func, *args):
+        future = Future()
+        with self._lock:
+            if not self._idle and self._threads < self.size:
+                self._threads += 1
+                thread = threading.Thread(target=self._work, name='pytsa-stat-{}'.format(self._threads))
+                thread.daemon = True
+                thread.start()
+        self._queue.put((future, func, args))
+        return future
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self._idle += 1
+            future, func, args = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as err:
+                future.set_exception(err)
+
+
+_pool = _Pool(min(32, (os.cpu_count() or 1) + 4))
+# mount point -> (time until which it is considered hung, future of the stat which timed out)
+_hung = {}
+_hung_lock = threading.Lock()
+
+
+def submit(func, *args):
+    """run func(*args) on a helper thread, returns a concurrent.futures.Future"""
+    return _pool.submit(func, *args)
+
+
+def _unescape(field):
+    # /proc/self/mounts escapes spaces, tabs, newlines and backslashes in octal
+    return field.replace('\\040', ' ').replace('\\011', '\t').replace('\\012', '\n').replace('\\134', '\\')
+
+
+def mount_point(path):
+    """returns the mount point of the absolute path, or its directory when the mounts cannot be read"""
+    try:
+        with open(_MOUNTS) as mounts:
+            points = [_unescape(line.split()[1]) for line in mounts if len(line.split()) > 1]
+    except OSError:
+        return os.path.dirname(path)
+    found = None
+    for point in points:
+        if _contains(point, path) and (found is None or len(point) > len(found)):
+            found = point
+    return found if found is not None else os.path.dirname(path)
+
+
+def _contains(directory, path):
+    return path == directory or path.startswith(directory if directory.endswith(os.sep) else directory + os.sep)
+
+
+def mark_hung(path, future=None):
+    """
+    remember the mount of the absolute path as hung for HUNG_MOUNT_TTL seconds, and after that until future is done,
+    returns the mount point
+    """
+    mount = mount_point(path)
+    with _hung_lock:
+        previous = _hung.get(mount)
+        if previous is not None and previous[1] is not None and not previous[1].done():
+            # The stat which timed out first is still blocked
+            future = previous[1]
+        _hung[mount] = (time.monotonic() + HUNG_MOUNT_TTL, future)
+    return mount
+
+
+def hung_mount(path):
+    """returns the mount point of the absolute path if it is considered hung, otherwise None"""
+    if not _hung:
+        return None
+    now = time.monotonic()
+    with _hung_lock:
+        for mount, (until, future) in list(_hung.items()):
+            if until <= now and (future is None or future.done()):
+                del _hung[mount]
+            elif _contains(mount, path):
+                return mount
+    return None
+
+
+def clear():
+    """forget all hung mounts"""
+    with _hung_lock:
+        _hung.clear()
@@ -0,0 +1,52 @@
+"""
+Support for decorating coroutine functions and async generators. Their rules are checked in a coroutine, where rules
+which block on the filesystem, like the stat of sa_path, are awaited through loop.run_in_executor so a slow disk does
+not stall the event loop. The default executor of the loop is used, unless another one is set with
+configure(executor=...)
+"""
+_executor = None
+
+
+def configure(executor=None):
+    """Sets the concurrent.futures executor running the blocking rules, None uses the default executor of the loop"""
+    global _executor
+    _executor = executor
+
+
+async def run_blocking(check, val):
+    """await check(val) on the executor"""
+    # asyncio is only imported once a coroutine function is checked, as importing it is slow
+    import asyncio
+    return await asyncio.get_event_loop().run_in_executor(_executor, check, val)
+
+
+def async_gen_wrapper(validator):
+    """
+    Returns an async generator function which awaits validator(*args, **kw) on the first iteration and then yields
+    from the async generator it returns, forwarding the values sent and exceptions thrown in
+    """
+
+    async def _wrapper(*args, **kw):
+        agen = await validator(*args, **kw)
+        try:
+            item = await agen.__anext__()
+        except StopAsyncIteration:
+            return
+        while True:
+            try:
+                value = yield item
+            except GeneratorExit:
+                await agen.aclose()
+                raise
+            except BaseException as err:
+                try:
+                    item = await agen.athrow(err)
+                except StopAsyncIteration:
+                    return
+            else:
+                try:
+                    item = await agen.asend(value)
+                except StopAsyncIteration:
+                    return
+
+    return _wrapper
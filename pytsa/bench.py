@@ -0,0 +1,330 @@
+"""
+Benchmarks of pytsa, run with `python -m pytsa.bench`. Measures for every decorator and rule the time of a call of a
+decorated function against the undecorated function, the time of calls with stacked decorators, the time to import a
+module of 10000 decorated functions, and the memory per decorated function with tracemalloc. When the decorator
+package is installed, the wrapper of pytsa is compared with the wrapper of the decorator package.
+
+With --json the results are written to a file, which a later run compares against with --compare. That run fails when
+a result is slower or larger than --threshold. The same cases run under pytest-benchmark from benchmarks/
+"""
+import argparse
+import atexit
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import pytsa
+from pytsa import sa_bool, sa_number, sa_type, sa_int, sa_float, sa_string, sa_list, sa_path
+
+STACK_DEPTHS = (1, 2, 4, 8)
+_paths = {}
+
+
+def _path(kind):
+    """returns the path of a temporary directory or file, readable, writable and executable by everyone"""
+    if not _paths:
+        directory = tempfile.mkdtemp(prefix='pytsa-bench-')
+        atexit.register(shutil.rmtree, directory, True)
+        _paths['dir'] = directory
+        _paths['file'] = os.path.join(directory, 'file')
+        with open(_paths['file'], 'w'):
+            pass
+        for path in _paths.values():
+            os.chmod(path, 0o777)
+    return _paths[kind]
+
+
+def cases():
+    """
+    Returns a list of (decorator name, rule name, decorator, valid value) for every rule of every decorator, the rule
+    'type' checks the type only
+    """
+    result = [
+        ('sa_bool', 'type', sa_bool('a'), True),
+        ('sa_type', 'type', sa_type('a'), int),
+    ]
+    numbers = [('gte', -5), ('lte', 6.5), ('gt', -4), ('lt', 4), ('non_zero', True)]
+    for name, decorator, val, mod in [('sa_number', sa_number, 3, 1), ('sa_int', sa_int, 3, 3),
+                                      ('sa_float', sa_float, 2.0, 0.5)]:
+        result.append((name, 'type', decorator('a'), val))
+        for rule, rule_val in numbers + [('mod', mod)]:
+            result.append((name, rule, decorator('a', **{rule: rule_val}), val))
+    result.append(('sa_int', 'gt+lte', sa_int('a', gt=-4, lte=4), 3))
+
+    strings = [('not_empty', True, 'abcd'), ('not_blank', True, 'abcd'), ('ends_with', 'cd', 'abcd'),
+               ('starts_with', 'ab', 'abcd'), ('contains', 'bc', 'abcd'), ('is_lower', True, 'abcd'),
+               ('is_upper', True, 'ABCD'), ('regex', '^a[a-z]*d$', 'abcd')]
+    result.append(('sa_string', 'type', sa_string('a'), 'abcd'))
+    for rule, rule_val, val in strings:
+        result.append(('sa_string', rule, sa_string('a', **{rule: rule_val}), val))
+
+    result.append(('sa_list', 'type', sa_list('a'), [1, 2, 3]))
+    for rule, rule_val in [('len', 3), ('type', int), ('not_empty', True)]:
+        result.append(('sa_list', rule, sa_list('a', **{rule: rule_val}), [1, 2, 3]))
+
+    result.append(('sa_path', 'type', sa_path('a'), _path('dir')))
+    path_rules = ['exists', 'is_dir', 'is_abs'] + ['can_{}_{}'.format(who, what) for who in ('owner', 'group', 'others')
+                                                   for what in ('read', 'write', 'execute')]
+    for rule in path_rules:
+        result.append(('sa_path', rule, sa_path('a', **{rule: True}), _path('dir')))
+    result.append(('sa_path', 'is_file', sa_path('a', is_file=True), _path('file')))
+    for rule, rule_val in [('stat_cache_ttl', 60), ('stat_cache_watch', True), ('timeout', 1)]:
+        result.append(('sa_path', 'exists+' + rule, sa_path('a', exists=True, **{rule: rule_val}), _path('dir')))
+    return result
+
+
+def _target(a):
+    return a
+
+
+def _stacked_target(a0, a1, a2, a3, a4, a5, a6, a7):
+    return a0
+
+
+def stacked(depth, func=_stacked_target):
+    """returns func, by default a function of 8 arguments, with sa_int on each of its first depth arguments"""
+    for index in range(depth):
+        func = sa_int('a{}'.format(index), gt=-4, lte=4)(func)
+    return func
+
+
+def _best_per_call(func, args, number, repeat):
+    """returns the fastest time of a single call in nanoseconds"""
+    timer = timeit.Timer(lambda: func(*args))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def measure(number=20000, repeat=5):
+    """
+    Returns a list of (decorator, rule, per call ns, overhead ns) for every case, the overhead is the difference with
+    calling the undecorated function
+    """
+    baseline = _best_per_call(_target, (1,), number, repeat)
+    results = [('undecorated', '', baseline, 0.0)]
+    for name, rule, decorator, val in cases():
+        per_call = _best_per_call(decorator(_target), (val,), number, repeat)
+        results.append((name, rule, per_call, per_call - baseline))
+    return results
+
+
+def measure_stacked(number=20000, repeat=5):
+    """Returns a list of (depth, per call ns, overhead ns) for every depth of STACK_DEPTHS"""
+    args = (1,) * 8
+    baseline = _best_per_call(_stacked_target, args, number, repeat)
+    return [(depth, per_call, per_call - baseline) for depth, per_call in
+            [(depth, _best_per_call(stacked(depth), args, number, repeat)) for depth in STACK_DEPTHS]]
+
+
+# The decorators of the functions in the module imported by measure_import, used in turn
+_MODULE_DECORATORS = [
+    ['@sa_int(\'a\', gt=0, lte=100)'],
+    ['@sa_string(\'a\', not_blank=True)'],
+    ['@sa_list(\'a\', type=int)'],
+    ['@sa_int(\'a\', gt=0)', '@sa_string(\'b\', allow_none=True)'],
+]
+
+
+def module_source(functions, decorated=True):
+    """returns the source of a module of functions, decorated by the decorators of _MODULE_DECORATORS in turn"""
+    lines = ['from pytsa import sa_int, sa_string, sa_list', '']
+    for index in range(functions):
+        if decorated:
+            lines += _MODULE_DECORATORS[index % len(_MODULE_DECORATORS)]
+        lines += ['def function_{}(a, b=None):'.format(index), '    return a', '']
+    return '\n'.join(lines)
+
+
+_imported = [0]
+
+
+def _import_seconds(path):
+    _imported[0] += 1
+    spec = importlib.util.spec_from_file_location('_pytsa_bench_{}'.format(_imported[0]), path)
+    module = importlib.util.module_from_spec(spec)
+    start = timeit.default_timer()
+    spec.loader.exec_module(module)
+    return timeit.default_timer() - start
+
+
+def measure_import(functions=10000, repeat=3, lazy=False):
+    """
+    Returns the time in us per function which decorating adds to importing a module of decorated functions, in lazy
+    mode when lazy is set
+    """
+    directory = tempfile.mkdtemp(prefix='pytsa-bench-')
+    dont_write_bytecode = sys.dont_write_bytecode
+    sys.dont_write_bytecode = True
+    pytsa.set_lazy(lazy)
+    try:
+        paths = []
+        for decorated in (False, True):
+            paths.append(os.path.join(directory, 'module_{}.py'.format(int(decorated))))
+            with open(paths[-1], 'w') as module:
+                module.write(module_source(functions, decorated))
+        undecorated = min(_import_seconds(paths[0]) for _ in range(repeat))
+        decorated = min(_import_seconds(paths[1]) for _ in range(repeat))
+    finally:
+        pytsa.set_lazy(os.environ.get('PYTSA_LAZY', 'False') == 'True')
+        sys.dont_write_bytecode = dont_write_bytecode
+        shutil.rmtree(directory, True)
+    return (decorated - undecorated) / functions * 1e6
+
+
+# The decorators measure_memory applies to every function
+MEMORY_CASES = [
+    ('sa_int', lambda: sa_int('a')),
+    ('sa_int gt+lte', lambda: sa_int('a', gt=-4, lte=4)),
+    ('sa_string regex', lambda: sa_string('a', regex='^[a-z]+$')),
+    ('sa_path', lambda: sa_path('a', exists=True, is_dir=True)),
+    ('stacked 4', lambda: lambda func: stacked(4, func)),
+]
+
+
+def measure_memory(functions=1000):
+    """Returns a list of (case, bytes) of the memory tracemalloc traces per function decorated by every MEMORY_CASES"""
+    results = []
+    for name, decorator in MEMORY_CASES:
+        targets = []
+        for _ in range(functions):
+            def _function(a, a0=None, a1=None, a2=None, a3=None):
+                return a
+
+            targets.append(_function)
+        started = tracemalloc.is_tracing()
+        if not started:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        decorated = [decorator()(target) for target in targets]
+        after = tracemalloc.get_traced_memory()[0]
+        if not started:
+            tracemalloc.stop()
+        results.append((name, (after - before) / len(decorated)))
+    return results
+
+
+# The validator of sa_int('a', gt=-4, lte=4) as it was generated for the decorator package, which binds the arguments
+# to the signature of the function on every call
+_DECORATOR_VALIDATOR = (
+    'def _sa_rule(_func, *args, **kw):\n'
+    '    val = args[0]\n'
+    '    if val is None:\n'
+    '        raise ValueError(val)\n'
+    '    if not (isinstance(val, int) and not isinstance(val, bool)):\n'
+    '        raise TypeError(val)\n'
+    '    if not -4 < val <= 4:\n'
+    '        raise ValueError(val)\n'
+    '    return _func(*args, **kw)\n'
+)
+
+
+def _decorator_engine(func):
+    from decorator import decorate
+
+    namespace = {}
+    exec(compile(_DECORATOR_VALIDATOR, '<pytsa>', 'exec'), namespace)
+    return decorate(func, namespace['_sa_rule'])
+
+
+def _pytsa_engine(func):
+    return sa_int('a', gt=-4, lte=4)(func)
+
+
+def compare_engines(number=20000, repeat=5, functions=1000):
+    """
+    Returns a list of (engine, decoration us, per call ns) for the wrapper of pytsa and, if it is installed, the
+    wrapper of the decorator package, applying sa_int('a', gt=-4, lte=4)
+    """
+    engines = [('pytsa', _pytsa_engine)]
+    try:
+        import decorator  # noqa: F401
+        engines.append(('decorator', _decorator_engine))
+    except ImportError:
+        pass
+
+    results = []
+    for name, engine in engines:
+        targets = []
+        for _ in range(functions):
+            def _function(a):
+                return a
+
+            targets.append(_function)
+        timer = timeit.Timer(lambda: [engine(target) for target in targets])
+        decoration = min(timer.repeat(repeat=repeat, number=1)) / functions * 1e6
+        results.append((name, decoration, _best_per_call(engine(_target), (2,), number, repeat)))
+    return results
+
+
+def run(number=20000, repeat=5, functions=10000, memory_functions=1000):
+    """
+    Runs all benchmarks, returns a dict of result name to value, where lower is better. Calls are in ns per call,
+    imports in us per function and memory in bytes per function
+    """
+    results = {}
+    for name, rule, per_call, _ in measure(number, repeat):
+        results['call/{}/{}'.format(name, rule) if rule else 'call/' + name] = per_call
+    for depth, per_call, _ in measure_stacked(number, repeat):
+        results['stacked/{}'.format(depth)] = per_call
+    results['import/eager'] = measure_import(functions, min(repeat, 3))
+    results['import/lazy'] = measure_import(functions, min(repeat, 3), lazy=True)
+    for name, size in measure_memory(memory_functions):
+        results['memory/' + name] = size
+    return results
+
+
+def compare(results, baseline, threshold=0.25):
+    """
+    Returns a list of (name, baseline value, value) of all results which are more than threshold, a fraction, higher
+    than in baseline
+    """
+    return [(name, baseline[name], value) for name, value in sorted(results.items())
+            if name in baseline and value > baseline[name] * (1 + threshold)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pytsa.bench', description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--number', type=int, default=20000, help='calls per timing')
+    parser.add_argument('--repeat', type=int, default=5, help='timings, the fastest one is used')
+    parser.add_argument('--functions', type=int, default=10000, help='functions in the imported module')
+    parser.add_argument('--memory-functions', type=int, default=1000, help='functions decorated to measure memory')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='compare the results with this file written by --json')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='fail when a result is this fraction higher than in --compare (default 0.25)')
+    args = parser.parse_args(argv)
+
+    results = run(args.number, args.repeat, args.functions, args.memory_functions)
+    print('{:<40} {:>12}'.format('benchmark', 'result'))
+    for name, value in results.items():
+        unit = {'call': 'ns', 'stacked': 'ns', 'import': 'us/function', 'memory': 'B/function'}[name.split('/')[0]]
+        print('{:<40} {:>12.1f} {}'.format(name, value, unit))
+    print()
+    print('{:<12} {:>12} {:>12}'.format('engine', 'us/decorate', 'ns/call'))
+    for name, decoration, per_call in compare_engines(number=args.number, repeat=args.repeat):
+        print('{:<12} {:>12.1f} {:>12.0f}'.format(name, decoration, per_call))
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                       'results': results}, output, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)['results'], args.threshold)
+        if regressions:
+            print()
+            print('{} results are more than {:.0%} higher than in {}:'.format(len(regressions), args.threshold,
+                                                                              args.compare))
+            for name, before, after in regressions:
+                print('{:<40} {:>12.1f} -> {:.1f}'.format(name, before, after))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
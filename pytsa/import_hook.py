@@ -0,0 +1,283 @@
+"""
+Optional import hook rewriting pytsa decorators into checks at the top of the function body, so they run in the frame
+of the function itself on its local variables, without a wrapper. install('app', 'other.package') rewrites the modules
+of the given packages which are imported after it.
+
+Only the innermost decorators of a function are rewritten, when they are used as sa_* or pytsa.sa_* with a string
+argument name and literal rules. Other decorators are left as they are, as are the decorators of generator functions,
+whose body only runs on the first next(). Rewritten functions are always validated, they
+do not take part in sampling or pytsa.enable and pytsa.disable.
+
+The rewritten code is cached next to the regular .pyc files, with an optimization tag which changes with pytsa
+"""
+import ast
+import hashlib
+import importlib.machinery
+import importlib.util
+import marshal
+import os
+import struct
+import sys
+
+import pytsa
+from pytsa._base_rule import _value_source
+
+_HEADER = struct.Struct('<4sIII')
+
+
+def _rule(name):
+    rule = getattr(pytsa, name, None) if name.startswith('sa_') else None
+    return rule if hasattr(rule, 'contract') else None
+
+
+def define(namespace, functions):
+    """
+    Called by rewritten modules on import, defines the values the inlined checks of every function use in the module
+    namespace. functions holds (prefix, awaitable, [(rule name, argument name, rules), ...]) per rewritten function
+    """
+    for prefix, awaitable, specs in functions:
+        values = {}
+        for index, (rule_name, arg_name, rules) in enumerate(specs):
+            _value_source(_rule(rule_name).contract(arg_name, **rules), index, values, awaitable)
+        for key, value in values.items():
+            namespace[prefix + key] = value
+
+
+class _Rename(ast.NodeTransformer):
+    """Renames val to the argument, and the values of the checks to their name in the module namespace"""
+
+    def __init__(self, arg_name, prefix, values):
+        self.arg_name = arg_name
+        self.prefix = prefix
+        self.values = values
+
+    def visit_Name(self, node):
+        if node.id == 'val':
+            node.id = self.arg_name
+        elif node.id in self.values:
+            node.id = self.prefix + node.id
+        return node
+
+
+# async def is new in Python 3.5, no node is an instance of an empty tuple
+_ASYNC_FUNCTION_DEF = getattr(ast, 'AsyncFunctionDef', ())
+
+
+def _is_generator(node):
+    """returns whether the body of a function yields, not counting the functions and classes defined in it"""
+    nodes = list(node.body)
+    while nodes:
+        child = nodes.pop()
+        if isinstance(child, (ast.Yield, ast.YieldFrom)):
+            return True
+        if not isinstance(child, (ast.FunctionDef, _ASYNC_FUNCTION_DEF, ast.ClassDef, ast.Lambda)):
+            nodes.extend(ast.iter_child_nodes(child))
+    return False
+
+
+class _Inliner(ast.NodeTransformer):
+
+    def __init__(self, tree):
+        # Local names of the pytsa decorators, and of the pytsa module itself
+        self.names = {}
+        self.modules = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module == 'pytsa' and not node.level:
+                for alias in node.names:
+                    if _rule(alias.name) is not None:
+                        self.names[alias.asname or alias.name] = alias.name
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.name == 'pytsa':
+                        self.modules.add(alias.asname or alias.name)
+        self.functions = []
+
+    def _spec(self, decorator, params):
+        """returns (rule name, argument name, rules) of a decorator which can be inlined, otherwise None"""
+        if not isinstance(decorator, ast.Call) or len(decorator.args) != 1:
+            return None
+        func = decorator.func
+        if isinstance(func, ast.Name):
+            rule_name = self.names.get(func.id)
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in self.modules:
+            rule_name = func.attr if _rule(func.attr) is not None else None
+        else:
+            return None
+        if rule_name is None:
+            return None
+        try:
+            arg_name = ast.literal_eval(decorator.args[0])
+            rules = dict((keyword.arg, ast.literal_eval(keyword.value)) for keyword in decorator.keywords)
+        except ValueError:
+            return None
+        if None in rules or arg_name not in params or 'sample_rate' in rules:
+            return None
+        try:
+            _rule(rule_name).contract(arg_name, **rules)
+        except (ValueError, TypeError):
+            # Left to the decorator, which raises the error on import
+            return None
+        return rule_name, arg_name, rules
+
+    def _visit_function(self, node):
+        self.generic_visit(node)
+        awaitable = isinstance(node, _ASYNC_FUNCTION_DEF)
+        if not awaitable and _is_generator(node):
+            # The body of a generator only runs on the first next(), the decorators check the arguments on the call
+            return node
+        args = node.args
+        params = set(arg.arg for arg in getattr(args, 'posonlyargs', []) + args.args + args.kwonlyargs)
+
+        # Only the innermost decorators run right before the function body
+        specs = []
+        while len(specs) < len(node.decorator_list):
+            spec = self._spec(node.decorator_list[len(node.decorator_list) - len(specs) - 1], params)
+            if spec is None:
+                break
+            specs.insert(0, spec)
+        if not specs:
+            return node
+
+        prefix = '_pytsa_{}_'.format(len(self.functions))
+        values = {}
+        statements = []
+        for index, (rule_name, arg_name, rules) in enumerate(specs):
+            contract = _rule(rule_name).contract(arg_name, **rules)
+            source = '\n'.join(_value_source(contract, index, values, awaitable)) + '\n'
+            if awaitable:
+                # await is only valid inside an async function, the checks are taken out of it again
+                source = 'async def _():\n' + ''.join('    ' + line + '\n' for line in source.splitlines())
+                body = ast.parse(source).body[0].body
+            else:
+                body = ast.parse(source).body
+            renamer = _Rename(arg_name, prefix, values)
+            statements += [renamer.visit(statement) for statement in body]
+
+        for statement in statements:
+            for child in ast.walk(statement):
+                if 'lineno' in child._attributes:
+                    child.lineno = child.end_lineno = node.lineno
+                    child.col_offset = child.end_col_offset = node.col_offset
+        docstring = 1 if ast.get_docstring(node, clean=False) is not None else 0
+        node.body[docstring:docstring] = statements
+        del node.decorator_list[len(node.decorator_list) - len(specs):]
+        self.functions.append((prefix, awaitable, specs))
+        return node
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def rewrite(self, tree):
+        tree = self.visit(tree)
+        if not self.functions:
+            return tree
+        # The values are defined on import, after the docstring and __future__ imports
+        call = ast.parse('__import__(\'pytsa.import_hook\', fromlist=[\'define\']).define(globals(), {!r})'.format(
+            self.functions)).body
+        position = 0
+        for index, statement in enumerate(tree.body):
+            if (index == 0 and ast.get_docstring(tree, clean=False) is not None) or (
+                    isinstance(statement, ast.ImportFrom) and statement.module == '__future__'):
+                position = index + 1
+        tree.body[position:position] = call
+        return ast.fix_missing_locations(tree)
+
+
+def rewrite(source, path='<unknown>'):
+    """returns the code of the module source, with the pytsa decorators rewritten into inline checks"""
+    tree = ast.parse(source, path)
+    return compile(_Inliner(tree).rewrite(tree), path, 'exec', dont_inherit=True)
+
+
+def _optimization():
+    """the optimization tag of the cached .pyc files, a digest of the pytsa sources generating the checks"""
+    digest = hashlib.sha1()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as source:
+                digest.update(source.read())
+    return 'pytsa' + digest.hexdigest()[:12]
+
+
+def _cache_from_source(path, optimization):
+    """the path of the cached .pyc file of the source path with the optimization tag"""
+    try:
+        return importlib.util.cache_from_source(path, optimization=optimization)
+    except TypeError:
+        # optimization is new in Python 3.5, the tag is added to the file name in the same way
+        base, extension = os.path.splitext(importlib.util.cache_from_source(path))
+        return '{}.opt-{}{}'.format(base, optimization, extension)
+
+
+class _Loader(importlib.machinery.SourceFileLoader):
+    """Loads a module with its pytsa decorators rewritten, caching its code in a separate .pyc file"""
+
+    optimization = None
+
+    def source_to_code(self, data, path, *, _optimize=-1):
+        return rewrite(data, path)
+
+    def get_code(self, fullname):
+        source_path = self.get_filename(fullname)
+        bytecode_path = _cache_from_source(source_path, self.optimization)
+        stats = self.path_stats(source_path)
+        header = _HEADER.pack(importlib.util.MAGIC_NUMBER, 0, int(stats['mtime']) & 0xFFFFFFFF,
+                              stats['size'] & 0xFFFFFFFF)
+        try:
+            data = self.get_data(bytecode_path)
+        except OSError:
+            data = None
+        if data is not None and data[:_HEADER.size] == header:
+            try:
+                return marshal.loads(data[_HEADER.size:])
+            except (EOFError, ValueError, TypeError):
+                pass
+
+        code = self.source_to_code(self.get_data(source_path), source_path)
+        if not sys.dont_write_bytecode:
+            self.set_data(bytecode_path, header + marshal.dumps(code))
+        return code
+
+
+class _Finder(object):
+    """Finds the modules of the given packages, and loads them with _Loader"""
+
+    def __init__(self, packages):
+        self.packages = packages
+        self.optimization = _optimization()
+
+    def find_spec(self, fullname, path=None, target=None):
+        if not any(fullname == package or fullname.startswith(package + '.') for package in self.packages):
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path)
+        if spec is None or type(spec.loader) is not importlib.machinery.SourceFileLoader:
+            return spec
+        spec.loader = _Loader(fullname, spec.origin)
+        spec.loader.optimization = self.optimization
+        return spec
+
+
+_finder = None
+
+
+def install(*packages):
+    """
+    Rewrites the pytsa decorators of the modules in the given packages which are imported afterwards. Does nothing when
+    the decorators are stripped, with PYTSA_DISABLED or under python -O
+    """
+    global _finder
+    if os.environ.get('PYTSA_DISABLED', 'False') == 'True' or (
+            not __debug__ and os.environ.get('PYTSA_KEEP_UNDER_OPTIMIZE', 'False') != 'True'):
+        return
+    uninstall()
+    _finder = _Finder(tuple(packages))
+    sys.meta_path.insert(0, _finder)
+
+
+def uninstall():
+    """Stops rewriting modules imported afterwards"""
+    global _finder
+    if _finder in sys.meta_path:
+        sys.meta_path.remove(_finder)
+    _finder = None
@@ -0,0 +1,118 @@
+"""
+Exports the counters of pytsa.profiling in the OpenMetrics text format, to be scraped by Prometheus. render() returns
+the text, serve(port) serves it on /metrics from a daemon thread, and MetricsHandler can be used in a server of its
+own. Only the validations which ran while profiling are counted, so start it with pytsa.profiling.start() or
+PYTSA_PROFILE=True.
+
+The families are
+
+- pytsa_validations_total, the checks by function, parameter, rule and outcome ('pass' or 'fail')
+- pytsa_validation_seconds, a histogram of the time of the checks by function, parameter and rule
+- pytsa_function_validations_total and pytsa_function_validation_seconds, the same for the validation of all
+  parameters of a function together
+"""
+import http.server
+import socketserver
+import threading
+
+from pytsa import profiling
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+# The upper bounds of the exported histogram buckets in ns. A check is counted below a bound when the upper bound of its
+# bucket in the histogram of pytsa.profiling is, which is at most an eighth above the time the check took
+BUCKETS_NS = (250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000, 10000000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels) + '}'
+
+
+def _seconds(nanoseconds):
+    return repr(nanoseconds / 1e9)
+
+
+def _histogram(name, labels, entry):
+    lines = []
+    for bound in BUCKETS_NS:
+        cumulative = sum(count for upper, count in entry['histogram'].items() if upper <= bound)
+        lines.append('{}_bucket{} {}'.format(name, _labels(labels + [('le', _seconds(bound))]), cumulative))
+    lines.append('{}_bucket{} {}'.format(name, _labels(labels + [('le', '+Inf')]), entry['calls']))
+    lines.append('{}_count{} {}'.format(name, _labels(labels), entry['calls']))
+    lines.append('{}_sum{} {}'.format(name, _labels(labels), _seconds(entry['total_ns'])))
+    return lines
+
+
+def _counter(name, labels, entry):
+    return ['{}_total{} {}'.format(name, _labels(labels + [('outcome', 'pass')]), entry['calls'] - entry['failures']),
+            '{}_total{} {}'.format(name, _labels(labels + [('outcome', 'fail')]), entry['failures'])]
+
+
+def render(stats=None):
+    """Returns the OpenMetrics text of stats, by default the current pytsa.stats()"""
+    if stats is None:
+        stats = profiling.stats()
+    families = {
+        'pytsa_validations': ('counter', 'Checks of a rule on a parameter', []),
+        'pytsa_validation_seconds': ('histogram', 'Time spent checking a rule on a parameter', []),
+        'pytsa_function_validations': ('counter', 'Validations of all parameters of a function', []),
+        'pytsa_function_validation_seconds': ('histogram', 'Time spent validating all parameters of a function', []),
+    }
+    for function, function_stats in sorted(stats.items()):
+        labels = [('function', function)]
+        families['pytsa_function_validations'][2].extend(
+            _counter('pytsa_function_validations', labels, function_stats))
+        families['pytsa_function_validation_seconds'][2].extend(
+            _histogram('pytsa_function_validation_seconds', labels, function_stats))
+        for parameter, rules in sorted(function_stats['arguments'].items()):
+            for rule, entry in sorted(rules.items()):
+                rule_labels = labels + [('parameter', parameter), ('rule', rule)]
+                families['pytsa_validations'][2].extend(_counter('pytsa_validations', rule_labels, entry))
+                families['pytsa_validation_seconds'][2].extend(
+                    _histogram('pytsa_validation_seconds', rule_labels, entry))
+
+    lines = []
+    for name, (metric_type, description, samples) in families.items():
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+        if metric_type == 'histogram':
+            lines.append('# UNIT {} seconds'.format(name))
+        lines.append('# HELP {} {}'.format(name, description))
+        lines += samples
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """http.server.ThreadingHTTPServer, which is new in Python 3.7"""
+
+    daemon_threads = True
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Serves render() on /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not logged to stderr
+        pass
+
+
+def serve(port, address=''):
+    """Serves the metrics on http://address:port/metrics from a daemon thread, returns the server to shut it down"""
+    server = _ThreadingHTTPServer((address, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='pytsa-metrics', daemon=True)
+    thread.start()
+    return server
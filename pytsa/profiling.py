@@ -0,0 +1,182 @@
+"""
+Opt-in profiling of the validation of decorated functions. While profiling, the validators record for every function
+and for every rule of its arguments how often it was checked, how often it failed, and the total and maximum time spent
+on it, measured with time.perf_counter in ns. Profiling is started with start() or the environment variable
+PYTSA_PROFILE=True, and the counters are read with pytsa.stats().
+
+The times are also counted in a log-bucketed histogram of fixed size for every rule, see pytsa._histogram. Checks
+which take longer than the slow threshold, set with configure(slow_threshold=...) or PYTSA_SLOW_THRESHOLD in seconds,
+are logged as a warning on the 'pytsa' logger.
+
+Every thread counts in its own accumulators, which stats() adds up, so validating takes no lock. Rewritten functions of
+pytsa.import_hook are not profiled
+"""
+import logging
+import os
+import reprlib
+import threading
+import time
+
+from pytsa import _histogram
+
+_logger = logging.getLogger('pytsa')
+
+
+def _perf_counter_ns():
+    return int(time.perf_counter() * 1e9)
+
+
+# perf_counter_ns is new in Python 3.7
+_clock = getattr(time, 'perf_counter_ns', _perf_counter_ns)
+_profiling = os.environ.get('PYTSA_PROFILE', 'False') == 'True'
+_local = threading.local()
+# The accumulators of every thread, and the totals of threads which ended
+_threads = []
+_retired = {}
+_lock = threading.Lock()
+# Checks taking longer are logged, no check takes 2 ** 63 ns
+_NO_THRESHOLD = 1 << 63
+_slow_ns = int(float(os.environ['PYTSA_SLOW_THRESHOLD']) * 1e9) if os.environ.get(
+    'PYTSA_SLOW_THRESHOLD') else _NO_THRESHOLD
+
+CALLS, FAILURES, TOTAL_NS, MAX_NS, HISTOGRAM = range(5)
+_index = _histogram.index
+
+
+def _new_entry():
+    return [0, 0, 0, 0, _histogram.new()]
+
+
+def configure(slow_threshold=None):
+    """Sets the time in seconds above which a single check is logged, None logs no checks"""
+    global _slow_ns
+    if slow_threshold is not None and (type(slow_threshold) not in (int, float) or slow_threshold < 0):
+        raise ValueError('slow threshold {} was not a positive number of seconds'.format(slow_threshold))
+    _slow_ns = _NO_THRESHOLD if slow_threshold is None else int(slow_threshold * 1e9)
+
+
+def enabled():
+    return _profiling
+
+
+def _set_profiling(profiling):
+    global _profiling
+    from pytsa import _base_rule
+    _profiling = profiling
+    # The validators which are already compiled are compiled again, with or without the profiling code
+    _base_rule.recompile_all()
+
+
+def start():
+    """Starts profiling all decorated functions, including those which are already decorated"""
+    _set_profiling(True)
+
+
+def stop():
+    """Stops profiling, the counters are kept until reset"""
+    _set_profiling(False)
+
+
+def counters():
+    """Returns the accumulators of the current thread, a dict of (function, argument, rule) to a list of counters"""
+    try:
+        return _local.counters
+    except AttributeError:
+        _local.counters = {}
+        with _lock:
+            _threads.append((threading.current_thread(), _local.counters))
+        return _local.counters
+
+
+def _log_slow(key, elapsed, val):
+    function, arg_name, rule = key
+    _logger.warning('slow validation of rule %s of argument \'%s\' of %s took %.1fus, with value %s', rule, arg_name,
+                    function, elapsed / 1000, reprlib.repr(val))
+
+
+def _record(thread_counters, key, start, failures, val):
+    now = _clock()
+    elapsed = now - start
+    entry = thread_counters.get(key)
+    if entry is None:
+        entry = thread_counters[key] = _new_entry()
+    entry[CALLS] += 1
+    entry[FAILURES] += failures
+    entry[TOTAL_NS] += elapsed
+    if elapsed > entry[MAX_NS]:
+        entry[MAX_NS] = elapsed
+    entry[HISTOGRAM][_index(elapsed)] += 1
+    if elapsed > _slow_ns and key[1] is not None:
+        _log_slow(key, elapsed, val)
+    return now
+
+
+def tick(thread_counters, key, start, val=None):
+    """Records a check of key on val which started at start and passed, returns the current time"""
+    return _record(thread_counters, key, start, 0, val)
+
+
+def fail(thread_counters, key, start, function_start, function_key, val):
+    """Records a failed check of key on val which started at start, and the failed validation of the function"""
+    _record(thread_counters, key, start, 1, val)
+    _record(thread_counters, function_key, function_start, 1, None)
+
+
+def _add(totals, thread_counters):
+    for key, entry in list(thread_counters.items()):
+        total = totals.setdefault(key, _new_entry())
+        total[CALLS] += entry[CALLS]
+        total[FAILURES] += entry[FAILURES]
+        total[TOTAL_NS] += entry[TOTAL_NS]
+        total[MAX_NS] = max(total[MAX_NS], entry[MAX_NS])
+        _histogram.merge(total[HISTOGRAM], entry[HISTOGRAM])
+
+
+def _entry(entry):
+    histogram = entry[HISTOGRAM]
+    return {'calls': entry[CALLS], 'failures': entry[FAILURES], 'total_ns': entry[TOTAL_NS], 'max_ns': entry[MAX_NS],
+            'p50_ns': _histogram.percentile(histogram, 50), 'p90_ns': _histogram.percentile(histogram, 90),
+            'p99_ns': _histogram.percentile(histogram, 99), 'histogram': _histogram.sparse(histogram)}
+
+
+def totals():
+    """Returns the counters of all threads added up, as a dict of (function, argument, rule) to a list of counters"""
+    result = {}
+    with _lock:
+        # The accumulators of threads which ended are folded into the retired totals
+        for thread, thread_counters in _threads:
+            if not thread.is_alive():
+                _add(_retired, thread_counters)
+        _threads[:] = [item for item in _threads if item[0].is_alive()]
+        _add(result, _retired)
+        for _, thread_counters in _threads:
+            _add(result, thread_counters)
+    return result
+
+
+def stats(counters_totals=None):
+    """
+    Returns the counters of all threads added up, as a dict of function name to its counters, which hold the counters
+    of every rule in 'arguments', by argument name and rule name. Counters are dicts of 'calls', 'failures', 'total_ns',
+    'max_ns', the upper bounds of the histogram buckets of the percentiles 'p50_ns', 'p90_ns' and 'p99_ns', and
+    'histogram', the number of checks by the upper bound in ns of their bucket. The type and None checks of an argument
+    are counted as rule 'type'. counters_totals are the totals to return instead of those of totals()
+    """
+    if counters_totals is None:
+        counters_totals = totals()
+    result = {}
+    for (function, arg_name, rule), entry in sorted(counters_totals.items(), key=lambda item: repr(item[0])):
+        function_stats = result.setdefault(function, dict(_entry(_new_entry()), arguments={}))
+        if arg_name is None:
+            function_stats.update(_entry(entry))
+        else:
+            function_stats['arguments'].setdefault(arg_name, {})[rule] = _entry(entry)
+    return result
+
+
+def reset():
+    """Resets all counters, checks which are running at the same time may still be counted"""
+    with _lock:
+        _retired.clear()
+        for _, thread_counters in _threads:
+            thread_counters.clear()
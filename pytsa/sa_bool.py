@@ -4,5 +4,5 @@ sa_bool = new_rule(
     rule_name='sa_bool',
     rule_types_name='bool',
     rule_rules={},
-    type_checker=lambda val: isinstance(val, bool)
+    type_checker='isinstance(val, bool)'
 )
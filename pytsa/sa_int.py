@@ -1,72 +1,62 @@
 from pytsa import sa_bool, sa_number
-from pytsa._base_rule import new_rule
+from pytsa._base_rule import new_rule, Check
+from pytsa.sa_number import _Bound, _fold_bounds
 
 
 @sa_number('rule_val')
 def _int_gte(arg_name, rule_val):
-    def _check(val):
-        if val < rule_val:
-            raise ValueError('int argument \'{}\' with value {} was not greater than or equal to {}'.format(arg_name,
-                                                                                                            val,
-                                                                                                            rule_val))
+    def _error(val):
+        return ValueError('int argument \'{}\' with value {} was not greater than or equal to {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return _Bound('gte', rule_val, _error)
 
 
 @sa_number('rule_val')
 def _int_lte(arg_name, rule_val):
-    def _check(val):
-        if val > rule_val:
-            raise ValueError('int argument \'{}\' with value {} was not lesser than or equal to {}'.format(arg_name,
-                                                                                                           val,
-                                                                                                           rule_val))
+    def _error(val):
+        return ValueError('int argument \'{}\' with value {} was not lesser than or equal to {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return _Bound('lte', rule_val, _error)
 
 
 @sa_number('rule_val')
 def _int_gt(arg_name, rule_val):
-    def _check(val):
-        if val <= rule_val:
-            raise ValueError('int argument \'{}\' with value {} was not greater than {}'.format(arg_name, val,
-                                                                                                rule_val))
+    def _error(val):
+        return ValueError('int argument \'{}\' with value {} was not greater than {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return _Bound('gt', rule_val, _error)
 
 
 @sa_number('rule_val')
 def _int_lt(arg_name, rule_val):
-    def _check(val):
-        if val >= rule_val:
-            raise ValueError('int argument \'{}\' with value {} was not larger than {}'.format(arg_name, val,
-                                                                                               rule_val))
+    def _error(val):
+        return ValueError('int argument \'{}\' with value {} was not larger than {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return _Bound('lt', rule_val, _error)
 
 
 @sa_bool('rule_val')
 def _int_nonzero(arg_name, rule_val):
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('int argument \'{}\' with value {} was 0'.format(arg_name, val))
 
-    def _check(val):
-        if val == 0:
-            raise ValueError('int argument \'{}\' with value {} was 0'.format(arg_name, val))
-
-    return _check
+    return Check('val == 0', _error)
 
 
 @sa_number('rule_val')
 def _int_modulo(arg_name, rule_val):
-    def _check(val):
-        if val % rule_val != 0:
-            raise ValueError('int argument \'{}\' with value {} was not a multiple of {}'.format(arg_name, val,
-                                                                                                 rule_val))
+    def _error(val):
+        return ValueError('int argument \'{}\' with value {} was not a multiple of {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return Check('val % {rule_val} != 0', _error, rule_val=rule_val)
 
 
 sa_int = new_rule(
@@ -80,5 +70,6 @@ sa_int = new_rule(
         'non_zero': _int_nonzero,
         'mod': _int_modulo
     },
-    type_checker=lambda val: isinstance(val, int) and not isinstance(val, bool)
+    type_checker='isinstance(val, int) and not isinstance(val, bool)',
+    planner=_fold_bounds
 )
@@ -1,5 +1,5 @@
 from pytsa import sa_int, sa_bool, sa_type
-from pytsa._base_rule import new_rule
+from pytsa._base_rule import new_rule, Check, LINEAR
 
 
 def _format_list(val):
@@ -10,42 +10,39 @@ def _format_list(val):
 
 @sa_int('rule_val')
 def _list_len(arg_name, rule_val):
-    def _check(val):
-        if len(val) != rule_val:
-            raise ValueError('list argument \'{}\' with value {} and length of {} was not equal to {}'.format(
-                arg_name, _format_list(val), len(val), rule_val))
+    def _error(val):
+        return ValueError('list argument \'{}\' with value {} and length of {} was not equal to {}'.format(
+            arg_name, _format_list(val), len(val), rule_val))
 
-    return _check
+    return Check('len(val) != {rule_val}', _error, rule_val=rule_val)
 
 
 @sa_type('rule_val')
 def _list_type(arg_name, rule_val):
-    def _check(val):
+    def _error(val):
         for i, v in enumerate(val):
             if v is None:
-                raise ValueError('list argument \'{}\' with type {} was None on index {}'.format(
+                return ValueError('list argument \'{}\' with type {} was None on index {}'.format(
                     arg_name, rule_val, type(v), i))
             if not isinstance(v,
                               rule_val):
-                raise TypeError('list argument \'{}\' with type {} had value with type {} on index {}'.format(
+                return TypeError('list argument \'{}\' with type {} had value with type {} on index {}'.format(
                     arg_name, rule_val, type(v), i))
 
-    return _check
+    # Only when a value is invalid the error looks for the first invalid index
+    return Check('not all(v is not None and isinstance(v, {rule_val}) for v in val)', _error, LINEAR,
+                 rule_val=rule_val)
 
 
 @sa_bool('rule_val')
 def _list_not_empty(arg_name, rule_val):
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('list argument \'{}\' was an empty array'.format(arg_name))
 
-    def _check(val):
-        if len(val) == 0:
-            raise ValueError('list argument \'{}\' was an empty array'.format(arg_name))
-
-    return _check
+    return Check('len(val) == 0', _error)
 
 
 sa_list = new_rule(
@@ -56,5 +53,5 @@ sa_list = new_rule(
         'type': _list_type,
         'not_empty': _list_not_empty,
     },
-    type_checker=lambda val: isinstance(val, list)
+    type_checker='isinstance(val, list)'
 )
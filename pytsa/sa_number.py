@@ -1,7 +1,8 @@
+import operator
 from decimal import Decimal
 
 # @sa_number('rule_val')
-from pytsa._base_rule import new_rule
+from pytsa._base_rule import new_rule, Check
 
 
 def _check_type_number(val):
@@ -19,80 +20,126 @@ def _check_type_bool(val):
         raise TypeError('rule value was of type {} with value {}, expected type bool'.format(type(val), val))
 
 
+class _Bound(Check):
+    """A gt, gte, lt or lte rule, which _fold_bounds folds together with the other bounds of the argument"""
+
+    # The comparison of a valid value with the rule value, and the same comparison with the rule value on the left
+    OPERATORS = {'gt': ('>', '<'), 'gte': ('>=', '<='), 'lt': ('<', '>'), 'lte': ('<=', '>=')}
+    COMPARE = {'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le}
+
+    def __init__(self, rule, rule_val, error):
+        Check.__init__(self, 'not val {} {{rule_val}}'.format(self.OPERATORS[rule][0]), error, rule_val=rule_val)
+        self.rule = rule
+        self.rule_val = rule_val
+
+    def holds(self, val):
+        return self.COMPARE[self.rule](val, self.rule_val)
+
+    def stricter_than(self, other):
+        """returns True if every value within this bound is also within the other bound on the same side"""
+        if self.rule_val == other.rule_val:
+            return self.rule in ('gt', 'lt')
+        if self.rule in ('gt', 'gte'):
+            return self.rule_val > other.rule_val
+        return self.rule_val < other.rule_val
+
+
+def _fold_bounds(arg_name, checks):
+    """
+    Fold all bounds into a single interval check, in place of the first bound. Redundant bounds are left out, and a
+    ValueError is raised if no value can be within the bounds
+    """
+    bounds = [check for check in checks if isinstance(check, _Bound)]
+    if not bounds:
+        return checks
+
+    lower = None
+    upper = None
+    for bound in bounds:
+        if bound.rule in ('gt', 'gte'):
+            if lower is None or bound.stricter_than(lower):
+                lower = bound
+        elif upper is None or bound.stricter_than(upper):
+            upper = bound
+
+    if lower is None or upper is None:
+        interval = lower or upper
+    else:
+        if lower.rule_val > upper.rule_val or (
+                lower.rule_val == upper.rule_val and (lower.rule == 'gt' or upper.rule == 'lt')):
+            raise ValueError('rules {}={} and {}={} for argument \'{}\' do not allow any value'.format(
+                lower.rule, lower.rule_val, upper.rule, upper.rule_val, arg_name))
+
+        def _error(val):
+            return upper.error(val) if lower.holds(val) else lower.error(val)
+
+        interval = Check('not {{lower}} {} val {} {{upper}}'.format(_Bound.OPERATORS[lower.rule][1],
+                                                                     _Bound.OPERATORS[upper.rule][0]),
+                         _error, lower=lower.rule_val, upper=upper.rule_val)
+
+    first = checks.index(bounds[0])
+    return checks[:first] + [interval] + [check for check in checks[first:] if not isinstance(check, _Bound)]
+
+
 def _number_gte(arg_name, rule_val):
     _check_type_number(rule_val)
 
-    def _check(val):
-        if val < rule_val:
-            raise ValueError('number argument \'{}\' with value {} was not greater than or equal to {}'.format(
-                arg_name,
-                val,
-                rule_val))
+    def _error(val):
+        return ValueError('number argument \'{}\' with value {} was not greater than or equal to {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return _Bound('gte', rule_val, _error)
 
 
 def _number_lte(arg_name, rule_val):
     _check_type_number(rule_val)
 
-    def _check(val):
-        if val > rule_val:
-            raise ValueError('number argument \'{}\' with value {} was not lesser than or equal to {}'.format(
-                arg_name,
-                val,
-                rule_val))
+    def _error(val):
+        return ValueError('number argument \'{}\' with value {} was not lesser than or equal to {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return _Bound('lte', rule_val, _error)
 
 
 def _number_gt(arg_name, rule_val):
     _check_type_number(rule_val)
 
-    def _check(val):
-        if val <= rule_val:
-            raise ValueError('number argument \'{}\' with value {} was not greater than {}'.format(arg_name, val,
-                                                                                                   rule_val))
+    def _error(val):
+        return ValueError('number argument \'{}\' with value {} was not greater than {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return _Bound('gt', rule_val, _error)
 
 
 def _number_lt(arg_name, rule_val):
     _check_type_number(rule_val)
 
-    def _check(val):
-        if val >= rule_val:
-            raise ValueError('number argument \'{}\' with value {} was not larger than {}'.format(arg_name, val,
-                                                                                                  rule_val))
+    def _error(val):
+        return ValueError('number argument \'{}\' with value {} was not larger than {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return _Bound('lt', rule_val, _error)
 
 
 def _number_nonzero(arg_name, rule_val):
     _check_type_bool(rule_val)
     if not rule_val:
-        def _check(val):
-            return
-
-        return _check
+        return None
 
-    def _check(val):
-        if val == 0:
-            raise ValueError('number argument \'{}\' with value {} was 0'.format(arg_name, val))
+    def _error(val):
+        return ValueError('number argument \'{}\' with value {} was 0'.format(arg_name, val))
 
-    return _check
+    return Check('val == 0', _error)
 
 
 def _number_modulo(arg_name, rule_val):
     _check_type_number(rule_val)
 
-    def _check(val):
-        if Decimal(val) % Decimal(rule_val) != Decimal(
-                '0.0'):
-            raise ValueError('number argument \'{}\' with value {} was not a multiple of {}'.format(arg_name,
-                                                                                                    val,
-                                                                                                    rule_val))
+    def _error(val):
+        return ValueError('number argument \'{}\' with value {} was not a multiple of {}'.format(
+            arg_name, val, rule_val))
 
-    return _check
+    return Check('{decimal}(val) % {mod} != 0', _error, decimal=Decimal, mod=Decimal(rule_val))
 
 
 sa_number = new_rule(
@@ -106,5 +153,6 @@ sa_number = new_rule(
         'non_zero': _number_nonzero,
         'mod': _number_modulo
     },
-    type_checker=lambda val: (isinstance(val, int) or isinstance(val, float)) and not isinstance(val, bool)
+    type_checker='(isinstance(val, int) or isinstance(val, float)) and not isinstance(val, bool)',
+    planner=_fold_bounds
 )
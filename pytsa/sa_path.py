@@ -1,253 +1,366 @@
 import os
+import pathlib
 import stat
-
-from pytsa import sa_bool
-from pytsa._base_rule import new_rule
+from concurrent.futures import TimeoutError as _FutureTimeout
+
+from pytsa import sa_bool, sa_number, stat_cache, _timeout
+from pytsa._base_rule import new_rule, Check, SYSCALL
+
+# Paths can be given as string, bytes, or any os.PathLike such as pathlib.Path and os.DirEntry
+_PATH_TYPES = (str, bytes, pathlib.PurePath) + ((os.PathLike,) if hasattr(os, 'PathLike') else ())
+_DIR_ENTRY = getattr(os, 'DirEntry', None)
+
+
+def _str_path(val):
+    """returns a pathlib path as str, other paths as they are"""
+    return str(val) if isinstance(val, pathlib.PurePath) else val
+
+
+# os.fspath is new in Python 3.6, before it the os functions only take paths as str or bytes
+_os_path = None if hasattr(os, 'fspath') else _str_path
+
+
+class _StatRule(object):
+    """
+    A rule on the os.stat result of the path, which _plan_stat checks together with the other stat rules of the
+    argument using a single os.stat call. Rules with a permission mask raise the os.stat error for a path which cannot
+    be stat, others raise their own error
+    """
+
+    def __init__(self, error, file_type=None, mask=0):
+        self.error = error
+        self.file_type = file_type
+        self.mask = mask
+
+    def fails(self, mode):
+        return (self.file_type is not None and stat.S_IFMT(mode) != self.file_type) or mode & self.mask != self.mask
+
+
+class PathValidationTimeout(TimeoutError):
+    """Raised by sa_path when the path could not be stat within the timeout, for instance on a hung network mount"""
+
+
+class _StatOption(object):
+    """The stat_cache_ttl, stat_cache_watch or timeout option, which is not a check itself but is used by _plan_stat"""
+
+    def __init__(self, ttl=None, watch=None, timeout=None):
+        self.ttl = ttl
+        self.watch = watch
+        self.timeout = timeout
+
+
+class _StatCheck(object):
+    """
+    Checks all stat rules of an argument with a single stat of the path, and all permissions with a single mask. The
+    first failing rule raises its error
+    """
+
+    blocking = True
+    cost = SYSCALL
+
+    def __init__(self, arg_name, stat_rules, ttl=None, watch=None, timeout=None):
+        self.arg_name = arg_name
+        self.stat_rules = stat_rules
+        self.ttl = ttl
+        self.watch = watch
+        self.timeout = timeout
+        self.mask = 0
+        for rule in stat_rules:
+            self.mask |= rule.mask
+        file_types = set(rule.file_type for rule in stat_rules if rule.file_type is not None)
+        # Requiring both a directory and a file always fails, so it never takes the fast path
+        self.file_type = file_types.pop() if len(file_types) == 1 else (None if not file_types else -1)
+
+    def mode(self, val):
+        """returns the st_mode of val, or only its file type when no permission is checked"""
+        if self.timeout is None:
+            return self._mode(val)
+
+        path = os.path.abspath(os.fsdecode(val))
+        mount = _timeout.hung_mount(path)
+        if mount is not None:
+            raise PathValidationTimeout('path argument \'{}\' with value \'{}\' was not checked, a stat on mount '
+                                        '\'{}\' timed out recently'.format(self.arg_name, val, mount))
+        future = _timeout.submit(self._mode, val)
+        try:
+            return future.result(self.timeout)
+        except _FutureTimeout:
+            # A stat still waiting for a thread is dropped, only a stat which is running is blocked on the mount
+            if not future.cancel():
+                _timeout.mark_hung(path, future)
+            raise PathValidationTimeout('path argument \'{}\' with value \'{}\' could not be stat within {} '
+                                        'seconds'.format(self.arg_name, val, self.timeout))
+
+    def _mode(self, val):
+        if type(val) is not _DIR_ENTRY:
+            return stat_cache.stat(val, self.ttl, self.watch).st_mode
+        if self.mask:
+            # The stat result is cached on the entry
+            return val.stat().st_mode
+        if val.is_dir():
+            # Often answered from the directory listing without a system call
+            return stat.S_IFDIR
+        if val.is_file():
+            return stat.S_IFREG
+        return val.stat().st_mode
+
+    def check(self, val, entry=None):
+        """check val, using the stat result of entry when given"""
+        target = val if entry is None else entry
+        if _os_path is not None:
+            target = _os_path(target)
+        try:
+            mode = self.mode(target)
+        except PathValidationTimeout:
+            raise
+        except (OSError, ValueError):
+            # A path which cannot be stat fails every rule, so the first rule decides what is raised
+            if self.stat_rules[0].mask:
+                raise
+            raise self.stat_rules[0].error(val)
+
+        if mode & self.mask == self.mask and (self.file_type is None or stat.S_IFMT(mode) == self.file_type):
+            return
+        for rule in self.stat_rules:
+            if rule.fails(mode):
+                raise rule.error(val)
+
+    def __call__(self, val):
+        self.check(val)
+
+
+def _plan_stat(arg_name, checks):
+    """
+    Fold all rules on the stat result of the path into a single _StatCheck in place of the first one, so the path is
+    stat once per call
+    """
+    ttl = None
+    watch = None
+    timeout = None
+    for option in checks:
+        if isinstance(option, _StatOption):
+            ttl = option.ttl if option.ttl is not None else ttl
+            watch = option.watch if option.watch is not None else watch
+            timeout = option.timeout if option.timeout is not None else timeout
+    checks = [check for check in checks if not isinstance(check, _StatOption)]
+
+    stat_rules = [check for check in checks if isinstance(check, _StatRule)]
+    if not stat_rules:
+        return checks
+
+    first = checks.index(stat_rules[0])
+    return checks[:first] + [_StatCheck(arg_name, stat_rules, ttl, watch, timeout)] + [
+        check for check in checks[first:] if not isinstance(check, _StatRule)]
 
 
 @sa_bool('rule_val')
 def _path_exists(arg_name, rule_val):
-    """ensure the path exists, using os.path.exists"""
+    """ensure the path exists, according to os.stat"""
     if not rule_val:
-        def _check(val):
-            return
-
-        return _check
+        return None
 
-    def _check(val):
-        if not os.path.exists(val):
-            raise ValueError('path argument \'{}\' with value \'{}\' did not exist'.format(arg_name, val))
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' did not exist'.format(arg_name, val))
 
-    return _check
+    return _StatRule(_error)
 
 
 @sa_bool('rule_val')
 def _path_is_dir(arg_name, rule_val):
-    """ensure the path is a directory, using os.path.isdir"""
+    """ensure the path is a directory, using stat.S_IFDIR"""
     if not rule_val:
-        def _check(val):
-            return
-
-        return _check
+        return None
 
-    def _check(val):
-        if not os.path.isdir(val):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not a directory'.format(arg_name, val))
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not a directory'.format(arg_name, val))
 
-    return _check
+    return _StatRule(_error, file_type=stat.S_IFDIR)
 
 
 @sa_bool('rule_val')
 def _path_is_file(arg_name, rule_val):
-    """ensure the path is a file, using os.path.isfile"""
+    """ensure the path is a file, using stat.S_IFREG"""
     if not rule_val:
-        def _check(val):
-            return
-
-        return _check
+        return None
 
-    def _check(val):
-        if not os.path.isfile(val):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not a file'.format(arg_name, val))
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not a file'.format(arg_name, val))
 
-    return _check
+    return _StatRule(_error, file_type=stat.S_IFREG)
 
 
 @sa_bool('rule_val')
 def _path_is_abs(arg_name, rule_val):
     """ensure the path is an absolute pathname, using os.path.isabs"""
     if not rule_val:
-        def _check(val):
-            return
-
-        return _check
+        return None
 
-    def _check(val):
-        if not os.path.isabs(val):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not absolute'.format(arg_name, val))
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not absolute'.format(arg_name, val))
 
-    return _check
+    isabs = os.path.isabs if _os_path is None else lambda val: os.path.isabs(_os_path(val))
+    return Check('not {isabs}(val)', _error, isabs=isabs)
 
 
 @sa_bool('rule_val')
 def _path_can_owner_write(arg_name, rule_val):
     """ensure the path has permission for owner to write using stat.S_IWUSR"""
     if not rule_val:
-        def _check(val):
-            return
-
-        return _check
+        return None
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IWUSR):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not writeable for owner'.format(
-                arg_name, val))
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not writeable for owner'.format(
+            arg_name, val))
 
-    return _check
+    return _StatRule(_error, mask=stat.S_IWUSR)
 
 
 @sa_bool('rule_val')
 def _path_can_group_write(arg_name, rule_val):
     """ensure the path has permission for group to write using stat.S_IWGRP"""
     if not rule_val:
-        def _check(val):
-            return
-
-        return _check
+        return None
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IWGRP):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not writeable for group'.format(
-                arg_name, val))
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not writeable for group'.format(
+            arg_name, val))
 
-    return _check
+    return _StatRule(_error, mask=stat.S_IWGRP)
 
 
 @sa_bool('rule_val')
 def _path_can_others_write(arg_name, rule_val):
     """ensure the path has permission for others to write using stat.S_IWOTH"""
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not writeable for others'.format(
+            arg_name, val))
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IWOTH):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not writeable for others'.format(
-                arg_name, val))
-
-    return _check
+    return _StatRule(_error, mask=stat.S_IWOTH)
 
 
 @sa_bool('rule_val')
 def _path_can_owner_read(arg_name, rule_val):
     """ensure the path has permission for owner to read using stat.S_IRUSR"""
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not readable for owner'.format(
+            arg_name, val))
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IRUSR):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not readable for owner'.format(
-                arg_name, val))
-
-    return _check
+    return _StatRule(_error, mask=stat.S_IRUSR)
 
 
 @sa_bool('rule_val')
 def _path_can_group_read(arg_name, rule_val):
     """ensure the path has permission for group to read using stat.S_IRGRP"""
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not readable for group'.format(
+            arg_name, val))
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IRGRP):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not readable for group'.format(
-                arg_name, val))
-
-    return _check
+    return _StatRule(_error, mask=stat.S_IRGRP)
 
 
 @sa_bool('rule_val')
 def _path_can_others_read(arg_name, rule_val):
     """ensure the path has permission for others to read using stat.S_IROTH"""
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not readable for others'.format(
+            arg_name, val))
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IROTH):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not readable for others'.format(
-                arg_name, val))
-
-    return _check
+    return _StatRule(_error, mask=stat.S_IROTH)
 
 
 @sa_bool('rule_val')
 def _path_can_owner_execute(arg_name, rule_val):
     """ensure the path has permission for owner to execute using stat.S_IXUSR"""
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not executable for owner'.format(
+            arg_name, val))
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IXUSR):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not executable for owner'.format(
-                arg_name, val))
-
-    return _check
+    return _StatRule(_error, mask=stat.S_IXUSR)
 
 
 @sa_bool('rule_val')
 def _path_can_group_execute(arg_name, rule_val):
     """ensure the path has permission for group to execute using stat.S_IXGRP"""
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not executable for group'.format(
+            arg_name, val))
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IXGRP):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not executable for group'.format(
-                arg_name, val))
-
-    return _check
+    return _StatRule(_error, mask=stat.S_IXGRP)
 
 
 @sa_bool('rule_val')
 def _path_can_others_execute(arg_name, rule_val):
     """ensure the path has permission for others to execute using stat.S_IXOTH"""
     if not rule_val:
-        def _check(val):
-            return
+        return None
 
-        return _check
+    def _error(val):
+        return ValueError('path argument \'{}\' with value \'{}\' was not executable for others'.format(
+            arg_name, val))
 
-    def _check(val):
-        if not bool(os.stat(
-                val).st_mode & stat.S_IXOTH):
-            raise ValueError('path argument \'{}\' with value \'{}\' was not executable for others'.format(
-                arg_name, val))
+    return _StatRule(_error, mask=stat.S_IXOTH)
 
-    return _check
 
+@sa_number('rule_val', gt=0)
+def _path_stat_cache_ttl(arg_name, rule_val):
+    """cache the stat result of the path for the given number of seconds, see pytsa.stat_cache"""
+    return _StatOption(ttl=rule_val)
+
+
+@sa_bool('rule_val')
+def _path_stat_cache_watch(arg_name, rule_val):
+    """cache the stat result of the path until inotify reports a change, see pytsa.stat_cache"""
+    return _StatOption(watch=rule_val)
+
+
+@sa_number('rule_val', gt=0)
+def _path_timeout(arg_name, rule_val):
+    """stat the path on a helper thread, and raise PathValidationTimeout when it takes longer than rule_val seconds"""
+    return _StatOption(timeout=rule_val)
+
+
+_path_rules = {
+    'exists': _path_exists,
+    'is_dir': _path_is_dir,
+    'is_file': _path_is_file,
+    'is_abs': _path_is_abs,
+    'can_owner_write': _path_can_owner_write,
+    'can_group_write': _path_can_group_write,
+    'can_others_write': _path_can_others_write,
+    'can_owner_read': _path_can_owner_read,
+    'can_group_read': _path_can_group_read,
+    'can_others_read': _path_can_others_read,
+    'can_owner_execute': _path_can_owner_execute,
+    'can_group_execute': _path_can_group_execute,
+    'can_others_execute': _path_can_others_execute,
+    'stat_cache_ttl': _path_stat_cache_ttl,
+    'stat_cache_watch': _path_stat_cache_watch,
+    'timeout': _path_timeout,
+}
 
 sa_path = new_rule(
     rule_name='sa_path',
     rule_types_name='path',
-    rule_rules={
-        'exists': _path_exists,
-        'is_dir': _path_is_dir,
-        'is_file': _path_is_file,
-        'is_abs': _path_is_abs,
-        'can_owner_write': _path_can_owner_write,
-        'can_group_write': _path_can_group_write,
-        'can_others_write': _path_can_others_write,
-        'can_owner_read': _path_can_owner_read,
-        'can_group_read': _path_can_group_read,
-        'can_others_read': _path_can_others_read,
-        'can_owner_execute': _path_can_owner_execute,
-        'can_group_execute': _path_can_group_execute,
-        'can_others_execute': _path_can_others_execute,
-    },
-    type_checker=lambda val: isinstance(val, str)
+    rule_rules=_path_rules,
+    type_checker='isinstance(val, {path_types})',
+    planner=_plan_stat,
+    type_values={'path_types': _PATH_TYPES}
 )
@@ -0,0 +1,151 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pytsa import sa_int
+from pytsa._base_rule import new_rule, compile_checks, LINEAR, SYSCALL
+from pytsa.sa_path import _PATH_TYPES, _DIR_ENTRY, _StatCheck, _plan_stat, _path_rules, _str_path
+
+# Directories with at least this many paths to check are listed once with os.scandir, instead of checking every path
+_SCAN_THRESHOLD = 8
+# The least number of paths stat by a single task on the thread pool
+_CHUNK_SIZE = 8
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+class InvalidPaths(ValueError):
+    """Raised by sa_paths when one or more paths are invalid, failures holds (index, exception) of every invalid path"""
+
+    def __init__(self, arg_name, failures):
+        ValueError.__init__(self, 'paths argument \'{}\' had {} invalid paths: {}'.format(
+            arg_name, len(failures), '; '.join('index {}: {}'.format(index, err) for index, err in failures)))
+        self.failures = failures
+
+
+def _executor(workers):
+    """returns the shared thread pool with the given number of workers"""
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            _executors[workers] = executor
+        return executor
+
+
+class _Workers(object):
+    """The workers option, which is not a check itself but is used by _plan_batch"""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+
+def _plan_batch(arg_name, checks):
+    """
+    Replace all checks by a single check validating every path in the list. Directories with many paths are listed
+    once when the file type is enough, the other paths are stat in chunks. Both are checked concurrently, as os.stat
+    releases the GIL. The error lists every invalid path
+    """
+    workers = None
+    for option in checks:
+        if isinstance(option, _Workers):
+            workers = option.workers
+    checks = _plan_stat(arg_name, [check for check in checks if not isinstance(check, _Workers)])
+
+    stat_check = None
+    for check in checks:
+        if isinstance(check, _StatCheck):
+            stat_check = check
+    # The checks which don't need a system call are run on every path first
+    check_path = compile_checks([check for check in checks if not isinstance(check, _StatCheck)])
+    # Listing the directory only helps when the file type is enough, permissions need a stat of every path
+    scan = stat_check is not None and not stat_check.mask
+
+    def _check_path(index, val, entries, failures):
+        try:
+            if val is None:
+                raise ValueError('paths argument \'{}\' was None on index {}'.format(arg_name, index))
+            if not isinstance(val, _PATH_TYPES):
+                raise TypeError('paths argument \'{}\' with value {} was of type {}, not of type \'path\''.format(
+                    arg_name, val, type(val)))
+            check_path(val)
+            if stat_check is not None:
+                entry = None
+                if entries is not None and type(val) is not _DIR_ENTRY:
+                    entry = entries.get(os.path.basename(os.fsdecode(_str_path(val))))
+                stat_check.check(val, entry)
+        except (ValueError, TypeError, OSError) as err:
+            failures.append((index, err))
+
+    def _check_group(directory, group):
+        """checks a group of paths, using a single listing of directory when given"""
+        failures = []
+        entries = None
+        if directory is not None:
+            try:
+                entries = {entry.name: entry for entry in os.scandir(directory)}
+            except OSError:
+                pass
+        for index, val in group:
+            _check_path(index, val, entries, failures)
+        return failures
+
+    def _check(val):
+        groups = {}
+        for index, path in enumerate(val):
+            try:
+                directory = os.path.dirname(os.path.abspath(os.fsdecode(_str_path(path))))
+            except (TypeError, ValueError):
+                # Not a path, reported by _check_path
+                directory = None
+            groups.setdefault(directory, []).append((index, path))
+
+        # Grouping only decides which directories are listed, the paths which need a stat of their own are split into
+        # chunks over the threads
+        tasks = []
+        paths = []
+        for directory, group in groups.items():
+            if scan and directory is not None and len(group) >= _SCAN_THRESHOLD:
+                tasks.append((directory, group))
+            else:
+                paths += group
+        count = workers or min(32, (os.cpu_count() or 1) + 4)
+        size = max(_CHUNK_SIZE, -(-len(paths) // count))
+        tasks += [(None, paths[start:start + size]) for start in range(0, len(paths), size)]
+
+        if len(tasks) <= 1 or count == 1 or stat_check is None:
+            failures = []
+            for directory, group in tasks:
+                failures += _check_group(directory, group)
+        else:
+            executor = _executor(count)
+            futures = [executor.submit(_check_group, directory, group) for directory, group in tasks]
+            failures = []
+            for future in futures:
+                failures += future.result()
+
+        if failures:
+            raise InvalidPaths(arg_name, sorted(failures, key=lambda failure: failure[0]))
+
+    _check.blocking = stat_check is not None
+    _check.cost = SYSCALL if stat_check is not None else LINEAR
+    return [_check]
+
+
+@sa_int('rule_val', gt=0)
+def _paths_workers(arg_name, rule_val):
+    """the maximum number of threads checking the paths concurrently"""
+    return _Workers(rule_val)
+
+
+_paths_rules = dict(_path_rules)
+_paths_rules['workers'] = _paths_workers
+
+sa_paths = new_rule(
+    rule_name='sa_paths',
+    rule_types_name='paths',
+    rule_rules=_paths_rules,
+    type_checker='isinstance(val, list)',
+    planner=_plan_batch
+)
@@ -0,0 +1,67 @@
+"""
+Sampling mode, validating only a fraction of the calls of a decorated function. The rate is set for a single decorator
+with the sample_rate rule, per module with configure(modules=...) or the environment variable PYTSA_SAMPLE_RATES
+('package.module=0.1,package=0.5'), or for all decorators with configure(rate=...) or PYTSA_SAMPLE_RATE. The rate is
+read when the decorator is applied, so configure it before importing the decorated modules.
+
+Deterministic sampling validates the first call and then spreads the validated calls evenly, so exactly 7 of every 10
+calls are validated at a rate of 0.7, random sampling (configure(mode='random') or PYTSA_SAMPLE_MODE=random) validates
+every call with a probability of rate. The other calls only count the call before calling the function
+"""
+import os
+
+DETERMINISTIC = 'deterministic'
+RANDOM = 'random'
+
+
+def _parse_modules(value):
+    modules = {}
+    for item in value.split(','):
+        if item.strip():
+            module, rate = item.split('=')
+            modules[module.strip()] = float(rate)
+    return modules
+
+
+_rate = float(os.environ['PYTSA_SAMPLE_RATE']) if os.environ.get('PYTSA_SAMPLE_RATE') else None
+_modules = _parse_modules(os.environ.get('PYTSA_SAMPLE_RATES', ''))
+_mode = os.environ.get('PYTSA_SAMPLE_MODE', DETERMINISTIC)
+
+
+def check_rate(rate):
+    """raises an exception if rate is not a number from 0 up to and including 1"""
+    if type(rate) not in (int, float):
+        raise TypeError('sample rate {} was of type {}, not of type \'number\''.format(rate, type(rate)))
+    if not 0 <= rate <= 1:
+        raise ValueError('sample rate {} was not between 0 and 1'.format(rate))
+
+
+def configure(rate=None, modules=None, mode=DETERMINISTIC):
+    """
+    Sets the sample rate of all decorators, and the rates per module given as a dict of module or package name to
+    rate. mode is either 'deterministic' or 'random'. Without a rate every call is validated
+    """
+    global _rate, _modules, _mode
+    if rate is not None:
+        check_rate(rate)
+    for module_rate in (modules or {}).values():
+        check_rate(module_rate)
+    if mode not in (DETERMINISTIC, RANDOM):
+        raise ValueError('sample mode \'{}\' is not \'{}\' or \'{}\''.format(mode, DETERMINISTIC, RANDOM))
+    _rate = rate
+    _modules = dict(modules or {})
+    _mode = mode
+
+
+def mode():
+    return _mode
+
+
+def rate_for(module):
+    """returns the sample rate of functions in module, the rate of its closest configured package or the global rate"""
+    name = module or ''
+    while name:
+        if name in _modules:
+            return _modules[name]
+        name = name.rpartition('.')[0]
+    return _rate
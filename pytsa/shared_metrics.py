@@ -0,0 +1,223 @@
+"""
+Metrics of all workers of a pre-fork server, such as gunicorn, in a multiprocessing.shared_memory segment. The master
+creates a SharedMetrics before forking, every worker calls start_worker() after the fork, and the master reads the
+counters of all workers added up with stats() or render(), without any IPC.
+
+Every worker owns a slot in the segment, where a daemon thread copies the totals of pytsa.profiling every interval, so
+validating costs no more than profiling in a single process. A worker claims the slot of a worker which exited, and
+first adds its counters to the retired slot, so the counters survive recycled workers. The retired slot holds more keys
+than the slot of a worker, as workers may validate different functions, and counters which do not fit are logged every
+time they are dropped. The master reads a slot again when the worker wrote it in the meantime, using a sequence number
+per slot.
+
+Needs multiprocessing.shared_memory, which is new in Python 3.8
+"""
+import array
+import hashlib
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from pytsa import _histogram, metrics, profiling
+
+_logger = logging.getLogger('pytsa')
+
+_MAGIC = b'PYTSA002'
+# magic, number of slots, number of entries per slot and number of entries of the retired slot
+_HEADER = struct.Struct('<8sQQQ')
+# pid of the worker owning the slot, sequence number which is odd while it is written, number of entries
+_SLOT_HEADER = struct.Struct('<QQQ')
+# The (function, argument, rule) key separated by _SEPARATOR, calls, failures, total_ns and max_ns, then the histogram
+_NAME_SIZE = 192
+_ENTRY = struct.Struct('<{}sQQQQ'.format(_NAME_SIZE))
+_ENTRY_SIZE = _ENTRY.size + 8 * _histogram.SIZE
+_SEPARATOR = '\x1f'
+# The slot of the counters of workers which exited
+_RETIRED = 0
+
+
+def _encode(key):
+    parts = ['' if part is None else part for part in key]
+    name = _SEPARATOR.join(parts).encode('utf-8')
+    if len(name) <= _NAME_SIZE:
+        return name
+    # Longer keys are shortened, and the function name ends in a digest of the whole key so they are still counted apart
+    digest = '~' + hashlib.sha1(name).hexdigest()[:16]
+    size = (_NAME_SIZE - 2 * len(_SEPARATOR) - len(digest)) // 3
+    parts = [part.encode('utf-8')[:size].decode('utf-8', 'ignore') for part in parts]
+    parts[0] += digest
+    return _SEPARATOR.join(parts).encode('utf-8')
+
+
+def _decode(name):
+    parts = name.rstrip(b'\0').decode('utf-8', 'ignore').split(_SEPARATOR)
+    parts += [''] * (3 - len(parts))
+    return tuple(part or None for part in parts[:3])
+
+
+def _alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedMetrics(object):
+    """
+    A shared memory segment with a slot for every worker, holding the counters of up to entries (function, argument,
+    rule) keys, and a slot for the counters of workers which exited holding up to retired_entries keys, by default four
+    times entries. Create it in the master before forking the workers
+    """
+
+    def __init__(self, slots=64, entries=256, name=None, retired_entries=None):
+        self.slots = slots
+        self.entries = entries
+        self.retired_entries = 4 * entries if retired_entries is None else retired_entries
+        self.slot_size = _SLOT_HEADER.size + entries * _ENTRY_SIZE
+        self.retired_size = _SLOT_HEADER.size + self.retired_entries * _ENTRY_SIZE
+        # The retired slot comes before the slots of the workers
+        self.memory = shared_memory.SharedMemory(name, create=True,
+                                                 size=_HEADER.size + self.retired_size + slots * self.slot_size)
+        _HEADER.pack_into(self.memory.buf, 0, _MAGIC, slots, entries, self.retired_entries)
+        self._lock = multiprocessing.Lock()
+        self._slot = None
+        self._stop = None
+        self._finalizer = None
+        self._flush_lock = threading.Lock()
+        self._warned = False
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def _offset(self, slot):
+        if slot == _RETIRED:
+            return _HEADER.size
+        return _HEADER.size + self.retired_size + (slot - 1) * self.slot_size
+
+    def _entries(self, slot):
+        return self.retired_entries if slot == _RETIRED else self.entries
+
+    def _read(self, slot):
+        """Returns the pid and the counters of a slot, as in pytsa.profiling.totals()"""
+        offset = self._offset(slot)
+        while True:
+            pid, sequence, count = _SLOT_HEADER.unpack_from(self.memory.buf, offset)
+            if sequence % 2:
+                if not _alive(pid):
+                    # The worker exited while writing the slot, which is empty until the slot is written
+                    return pid, {}
+                time.sleep(0)
+                continue
+            counters = {}
+            for index in range(min(count, self._entries(slot))):
+                entry_offset = offset + _SLOT_HEADER.size + index * _ENTRY_SIZE
+                name, calls, failures, total_ns, max_ns = _ENTRY.unpack_from(self.memory.buf, entry_offset)
+                start = entry_offset + _ENTRY.size
+                histogram = array.array('Q', bytes(self.memory.buf[start:start + 8 * _histogram.SIZE]))
+                counters[_decode(name)] = [calls, failures, total_ns, max_ns, histogram]
+            if _SLOT_HEADER.unpack_from(self.memory.buf, offset)[1] == sequence:
+                return pid, counters
+
+    def _write(self, slot, pid, counters):
+        offset = self._offset(slot)
+        sequence = _SLOT_HEADER.unpack_from(self.memory.buf, offset)[1]
+        _SLOT_HEADER.pack_into(self.memory.buf, offset, pid, sequence + 1, 0)
+        entries = self._entries(slot)
+        keys = sorted(counters, key=repr)
+        if len(keys) > entries and slot == _RETIRED:
+            # Dropped for good, so logged every time
+            _logger.warning('pytsa shared metrics hold %s entries of workers which exited, the counters of %s are '
+                            'dropped', entries, len(keys) - entries)
+        elif len(keys) > entries and not self._warned:
+            # The same counters are written again every interval, so this is logged once
+            self._warned = True
+            _logger.warning('pytsa shared metrics hold %s entries per worker, %s are counted', entries, len(keys))
+        for index, key in enumerate(keys[:entries]):
+            entry_offset = offset + _SLOT_HEADER.size + index * _ENTRY_SIZE
+            calls, failures, total_ns, max_ns, histogram = counters[key]
+            _ENTRY.pack_into(self.memory.buf, entry_offset, _encode(key), calls, failures, total_ns, max_ns)
+            start = entry_offset + _ENTRY.size
+            self.memory.buf[start:start + 8 * _histogram.SIZE] = histogram.tobytes()
+        _SLOT_HEADER.pack_into(self.memory.buf, offset, pid, sequence + 2, min(len(keys), entries))
+
+    def start_worker(self, interval=1.0):
+        """
+        Claims a slot for the current process and starts copying its counters to it every interval seconds, and when
+        the process exits. Starts profiling if it was not started, and resets the counters inherited from the master
+        """
+        pid = os.getpid()
+        with self._lock:
+            for slot in range(1, self.slots + 1):
+                slot_pid, counters = self._read(slot)
+                if slot_pid != pid and _alive(slot_pid):
+                    continue
+                if counters:
+                    # Keep the counters of the worker which exited
+                    retired = self._read(_RETIRED)[1]
+                    profiling._add(retired, counters)
+                    self._write(_RETIRED, pid, retired)
+                self._write(slot, pid, {})
+                self._slot = slot
+                break
+            else:
+                raise RuntimeError('all {} slots of the pytsa shared metrics are taken'.format(self.slots))
+
+        profiling.reset()
+        if not profiling.enabled():
+            profiling.start()
+        self._stop = threading.Event()
+        thread = threading.Thread(target=self._flush_every, args=(interval, self._stop), name='pytsa-shared-metrics',
+                                  daemon=True)
+        thread.start()
+        # Run on exit of the process, including processes of multiprocessing which do not run atexit
+        self._finalizer = multiprocessing.util.Finalize(self, self.flush, exitpriority=0)
+
+    def _flush_every(self, interval, stop):
+        while not stop.wait(interval):
+            self.flush()
+
+    def flush(self):
+        """Copies the counters of the current worker to its slot"""
+        with self._flush_lock:
+            if self._slot is not None and os.getpid() == _SLOT_HEADER.unpack_from(
+                    self.memory.buf, self._offset(self._slot))[0]:
+                self._write(self._slot, os.getpid(), profiling.totals())
+
+    def totals(self):
+        """Returns the counters of all workers added up, as in pytsa.profiling.totals()"""
+        result = {}
+        for slot in range(self.slots + 1):
+            profiling._add(result, self._read(slot)[1])
+        return result
+
+    def stats(self):
+        """Returns the counters of all workers added up, as returned by pytsa.stats()"""
+        return profiling.stats(self.totals())
+
+    def render(self):
+        """Returns the counters of all workers added up in the OpenMetrics text format"""
+        return metrics.render(self.stats())
+
+    def close(self):
+        """Stops copying the counters of the current worker and closes the segment in the current process"""
+        if self._stop is not None:
+            self._stop.set()
+        if self._finalizer is not None:
+            self._finalizer.cancel()
+        self._slot = None
+        self.memory.close()
+
+    def unlink(self):
+        """Removes the segment, once the master and all workers closed it"""
+        self.memory.unlink()
@@ -0,0 +1,211 @@
+"""
+Opt-in cache of os.stat results for the sa_path rules, keyed by path. Enable it for all sa_path decorators with
+configure(ttl=..., watch=...) or the environment variables PYTSA_STAT_CACHE_TTL and PYTSA_STAT_CACHE_WATCH, or for a
+single decorator with the rules stat_cache_ttl and stat_cache_watch. Only successful stat results are cached
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from pytsa import _inotify
+
+
+class StatCache(object):
+    """
+    LRU cache of os.stat results keyed by absolute path, holding at most maxsize entries. A cached result is used when
+    it is younger than the ttl (in seconds) given on lookup, or the default ttl of the cache. Without a ttl nothing is
+    cached.
+
+    With watch, the parent directory of a path is watched with inotify and a cached result is used until the path is
+    created, deleted, renamed or its attributes change. Where inotify is not available, the ttl is used instead. At most
+    maxsize directories are watched
+    """
+
+    def __init__(self, ttl=None, maxsize=1024, watch=False):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.watch = watch
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # absolute path -> (time of stat, stat result, (watched directory, name) or None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inotify = None
+        self._inotify_error = None
+        # watched directory -> watch descriptor and the reverse, (directory, name) -> cached paths
+        self._watches = {}
+        self._directories = {}
+        self._watched = {}
+        # Incremented on every inotify event, a stat result is only kept as watched if no event came in meanwhile
+        self._generation = 0
+        # The inotify thread does not run in a forked process, which starts an instance of its own
+        self._pid = os.getpid()
+
+    def stat(self, path, ttl=None, watch=None):
+        if ttl is None:
+            ttl = self.ttl
+        watch = (self.watch if watch is None else watch) and self._start_inotify()
+        if ttl is None and not watch:
+            return os.stat(path)
+
+        # Relative paths are cached by their absolute path, so they are looked up again after os.chdir
+        key = path if os.path.isabs(path) else os.path.abspath(path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[2] is not None or (ttl is not None and now - entry[0] < ttl)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            watched = self._watch(key) if watch else None
+            generation = self._generation
+
+        # Stat outside of the lock, so a slow path does not block lookups of other paths
+        result = os.stat(path)
+        with self._lock:
+            if generation != self._generation:
+                watched = None
+            if watched is None and ttl is None:
+                return result
+            self._remove(key)
+            self._entries[key] = (now, result, watched)
+            if watched is not None:
+                self._watched.setdefault(watched, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return result
+
+    def _start_inotify(self):
+        """returns whether inotify is available, starting it on first use and again after a fork"""
+        if self._pid != os.getpid():
+            self._after_fork()
+        if self._inotify is None and self._inotify_error is None:
+            with self._lock:
+                if self._inotify is None and self._inotify_error is None:
+                    try:
+                        self._inotify = _inotify.Inotify(self._invalidate)
+                    except (OSError, AttributeError) as err:
+                        self._inotify_error = err
+        return self._inotify is not None
+
+    def _after_fork(self):
+        """drops the inotify instance and watched entries inherited from the parent, whose thread reads the events"""
+        self._pid = os.getpid()
+        # The lock may have been held by another thread of the parent while it forked
+        self._lock = threading.Lock()
+        if self._inotify is not None:
+            self._inotify.close()
+        self._inotify = None
+        self._inotify_error = None
+        for paths in list(self._watched.values()):
+            for path in list(paths):
+                self._remove(path)
+        self._watches.clear()
+        self._directories.clear()
+
+    def _watch(self, path):
+        """watch the parent directory of an absolute path, returns the (directory, name) its events refer to, or None"""
+        directory, name = os.path.split(os.path.normpath(os.fsdecode(path)))
+        if not name:
+            # The root directory has no parent, watch itself
+            name = ''
+        if directory not in self._watches:
+            if len(self._watches) >= self.maxsize:
+                return None
+            try:
+                wd = self._inotify.add_watch(directory)
+            except OSError:
+                return None
+            self._watches[directory] = wd
+            self._directories[wd] = directory
+        return directory, name
+
+    def _remove(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None and entry[2] is not None:
+            paths = self._watched.get(entry[2])
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._watched[entry[2]]
+
+    def _invalidate(self, wd, mask, name):
+        """called from the inotify thread for every event"""
+        with self._lock:
+            self._generation += 1
+            if mask & _inotify.IN_Q_OVERFLOW:
+                # Events were lost, no watched entry can be trusted
+                keys = list(self._watched)
+            else:
+                directory = self._directories.get(wd)
+                if directory is None:
+                    return
+                if mask & (_inotify.IN_DELETE_SELF | _inotify.IN_MOVE_SELF | _inotify.IN_IGNORED):
+                    keys = [key for key in self._watched if key[0] == directory]
+                else:
+                    keys = [(directory, name)]
+                if mask & _inotify.IN_IGNORED:
+                    # The watch is removed by the kernel, the directory is watched again when needed
+                    del self._directories[wd]
+                    if self._watches.get(directory) == wd:
+                        del self._watches[directory]
+
+            for key in keys:
+                for path in list(self._watched.get(key, ())):
+                    self._remove(path)
+                    self.invalidations += 1
+
+    def stats(self):
+        """returns the hit, miss, eviction and invalidation counters and the current number of entries"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'invalidations': self.invalidations, 'size': len(self._entries), 'maxsize': self.maxsize,
+                    'watches': len(self._watches)}
+
+    def clear(self):
+        """removes all entries and resets the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._watched.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+
+
+_ttl = os.environ.get('PYTSA_STAT_CACHE_TTL')
+_cache = StatCache(ttl=float(_ttl) if _ttl else None,
+                   watch=os.environ.get('PYTSA_STAT_CACHE_WATCH', 'False') == 'True')
+
+
+def configure(ttl=None, maxsize=None, watch=False):
+    """
+    Sets the default ttl in seconds and whether to watch paths with inotify, used by all sa_path decorators without
+    stat_cache_ttl or stat_cache_watch. Without both caching is disabled. maxsize sets the maximum number of cached
+    paths
+    """
+    with _cache._lock:
+        _cache.ttl = ttl
+        _cache.watch = watch
+        if maxsize is not None:
+            _cache.maxsize = maxsize
+            while len(_cache._entries) > maxsize:
+                _cache._remove(next(iter(_cache._entries)))
+                _cache.evictions += 1
+
+
+def stat(path, ttl=None, watch=None):
+    return _cache.stat(path, ttl, watch)
+
+
+def stats():
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
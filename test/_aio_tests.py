@@ -0,0 +1,165 @@
+"""The tests of pytsa.aio, imported by test_aio where coroutine functions and async generators compile"""
+import inspect
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from unittest import TestCase, mock
+
+import pytsa
+from pytsa import sa_int, sa_path, sa_paths, aio, profiling
+from test.test_utils import run
+
+
+class TestAio(TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.test_file = path.join(self.test_dir, 'test.txt')
+        with open(self.test_file, 'w') as f:
+            f.write('Temp test file')
+
+    def tearDown(self):
+        aio.configure(executor=None)
+
+    def test_coroutine_function(self):
+        @sa_int('a', gt=0)
+        @sa_path('b', is_file=True)
+        async def _test(a, b):
+            return a
+
+        self.assertTrue(inspect.iscoroutinefunction(_test))
+        self.assertIn('await _run_blocking', _test.__pytsa_source__)
+
+        # Correct usage
+        self.assertEqual(run(_test(1, self.test_file)), 1)
+
+        # Incorrect usage, raised when awaited
+        with self.assertRaises(ValueError):
+            run(_test(0, self.test_file))
+        with self.assertRaises(ValueError):
+            run(_test(1, self.test_dir))
+        with self.assertRaises(TypeError):
+            run(_test(1, 2))
+
+    def test_stat_on_executor(self):
+        # The stat of the path is run on the configured executor, not on the thread of the event loop
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        aio.configure(executor=executor)
+        threads = []
+
+        def _stat(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return os_stat(*args, **kwargs)
+
+        @sa_path('a', is_file=True)
+        async def _test(a):
+            return threading.current_thread()
+
+        os_stat = os.stat
+        with mock.patch('os.stat', side_effect=_stat):
+            loop_thread = run(_test(self.test_file))
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+
+        @sa_paths('a', is_file=True)
+        async def _test_paths(a):
+            return a
+
+        run(_test_paths([self.test_file, self.test_file]))
+        with self.assertRaises(ValueError):
+            run(_test_paths([self.test_file, self.test_dir]))
+
+    def test_async_generator(self):
+        @sa_int('a', gt=0)
+        @sa_path('b', is_file=True)
+        async def _test(a, b):
+            received = yield a
+            while received is not None:
+                try:
+                    received = yield received * 2
+                except KeyError:
+                    received = yield -1
+
+        self.assertFalse(inspect.iscoroutinefunction(_test))
+
+        async def _run(a, b):
+            gen = _test(a, b)
+            values = [await gen.__anext__(), await gen.asend(2), await gen.athrow(KeyError()), await gen.asend(5)]
+            await gen.aclose()
+            return values
+
+        self.assertEqual(run(_run(1, self.test_file)), [1, 4, -1, 10])
+
+        # Incorrect usage, raised on the first iteration
+        async def _first(a, b):
+            return [value async for value in _test(a, b)]
+
+        with self.assertRaises(ValueError):
+            run(_first(0, self.test_file))
+        with self.assertRaises(ValueError):
+            run(_first(1, self.test_dir))
+
+
+class TestAioEnableDisable(TestCase):
+
+    def tearDown(self):
+        pytsa.enable()
+
+    def test_disable_coroutine_function(self):
+        @sa_int('a', gt=0)
+        async def _test(a):
+            return a
+
+        pytsa.disable(_test)
+        self.assertEqual(run(_test(-1)), -1)
+        pytsa.enable(_test)
+        with self.assertRaises(ValueError):
+            run(_test(-1))
+
+
+class TestAioLazy(TestCase):
+
+    def setUp(self):
+        pytsa.set_lazy()
+
+    def tearDown(self):
+        pytsa.set_lazy(False)
+
+    def test_compile_all(self):
+        @sa_int('a', gt=0)
+        async def _test(a):
+            return a
+
+        self.assertIsNone(_test.__pytsa__.source)
+        pytsa.compile_all()
+        self.assertIsNotNone(_test.__pytsa__.source)
+        with self.assertRaises(ValueError):
+            run(_test(0))
+
+
+class TestAioProfiling(TestCase):
+
+    def setUp(self):
+        profiling.reset()
+        profiling.start()
+
+    def tearDown(self):
+        profiling.stop()
+        profiling.reset()
+
+    def test_awaited_check(self):
+        # The stat awaited on the executor is counted as its rule
+        @sa_path('p', is_dir=True)
+        async def _test(p):
+            return p
+
+        run(_test(tempfile.gettempdir()))
+        with self.assertRaises(ValueError):
+            run(_test(tempfile.gettempdir() + '/non-existent'))
+
+        stats = pytsa.stats()[__name__ + '.TestAioProfiling.test_awaited_check.<locals>._test']
+        self.assertEqual((stats['calls'], stats['failures']), (2, 1))
+        self.assertEqual(stats['arguments']['p']['is_dir']['failures'], 1)
@@ -0,0 +1,8 @@
+import sys
+from unittest import SkipTest
+
+if sys.version_info < (3, 6):
+    # async def is new in Python 3.5 and async generators in 3.6, the tests do not compile before
+    raise SkipTest('coroutine functions and async generators need Python 3.6')
+
+from test._aio_tests import TestAio, TestAioEnableDisable, TestAioLazy, TestAioProfiling
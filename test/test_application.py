@@ -1,7 +1,24 @@
+import cProfile
+import functools
+import gc
+import inspect
 import itertools
-from unittest import TestCase
+import linecache
+import os
+import re
+import subprocess
+import sys
+import threading
+import traceback
+from unittest import TestCase, mock
 
-from pytsa import sa_int, sa_number, sa_string, sa_type
+import pytsa
+from pytsa import sa_int, sa_list, sa_number, sa_path, sa_string, sa_type
+from pytsa._base_rule import new_rule
+
+# unittest discover -s test/ imports this module as test_application, outside of the test package
+_PACKAGE = __name__.rpartition('.')[0] or __name__
+_SIBLING = __name__.rpartition('.')[0] + '.test_sa_int' if '.' in __name__ else 'test_sa_int'
 
 
 class TestMultipleRules(TestCase):
@@ -54,3 +71,411 @@ class TestMultipleRules(TestCase):
         for a, b, c, d in itertools.product(incorrect_a, incorrect_b, incorrect_c, incorrect_d):
             with self.assertRaises(Exception):
                 _test(a, b, **{'c': c, 'd': d})
+
+    def test_stacked_rules_share_one_wrapper(self):
+        def _test(a, b, *, c=int, d):
+            return
+
+        _test_wrapped = sa_int('a', gt=-4, lte=4.0)(
+            sa_string('b', starts_with='ab')(sa_type('c')(sa_number('d', allow_none=True)(_test))))
+
+        # The stacked decorators are merged into a single wrapper around the original function
+        assert _test_wrapped.__wrapped__ is _test
+        assert inspect.getfullargspec(_test_wrapped) == inspect.getfullargspec(_test)
+
+    def test_stacked_rules_error_order(self):
+        # The outer decorator is checked first, as it is when every decorator has its own wrapper
+        @sa_int('a')
+        @sa_string('b')
+        def _test(a, b):
+            return
+
+        with self.assertRaisesRegex(TypeError, 'int argument \'a\''):
+            _test('a', 1)
+
+        with self.assertRaisesRegex(TypeError, 'string argument \'b\''):
+            _test(1, 1)
+
+    def test_stacked_rules_around_other_decorator(self):
+        # A decorator in between pytsa decorators that copies the wrapper attributes should not be skipped
+        calls = []
+
+        def _other(func):
+            @functools.wraps(func)
+            def _wrapper(*args, **kw):
+                calls.append(args)
+                return func(*args, **kw)
+
+            return _wrapper
+
+        @sa_int('a')
+        @_other
+        @sa_string('b')
+        def _test(a, b):
+            return
+
+        _test(1, 'b')
+        assert calls == [(1, 'b')]
+        with self.assertRaises(TypeError):
+            _test(1, 1)
+
+    def test_argument_binding(self):
+        # Arguments are found however they are passed, without binding them to the signature
+        @sa_int('a', gt=0)
+        @sa_int('b', gt=0)
+        @sa_int('c', gt=0)
+        def _test(a, b=1, *args, c=2, **kw):
+            return a, b, args, c, kw
+
+        self.assertEqual(_test(1), (1, 1, (), 2, {}))
+        self.assertEqual(_test(a=1, b=2, c=3, d=4), (1, 2, (), 3, {'d': 4}))
+        self.assertEqual(_test(1, 2, 3, 4), (1, 2, (3, 4), 2, {}))
+        with self.assertRaises(ValueError):
+            _test(b=1, a=0)
+        with self.assertRaises(ValueError):
+            _test(1, -1)
+        with self.assertRaises(ValueError):
+            _test(1, c=-1)
+
+        # A missing argument raises the TypeError of the function itself
+        with self.assertRaisesRegex(TypeError, 'missing 1 required positional argument'):
+            _test(b=1)
+
+    def test_signature(self):
+        class _Test(object):
+            @sa_int('a', gt=0)
+            def method(self, a, *, b=None):
+                """method docstring"""
+                return a
+
+        def _test(a, *, b=None):
+            return a
+
+        # Signature, docstring and name are those of the function, also for help()
+        self.assertEqual(inspect.signature(_Test.method), inspect.signature(_Test.method.__wrapped__))
+        self.assertEqual(_Test.method.__doc__, 'method docstring')
+        self.assertEqual(_Test.method.__qualname__, _Test.method.__wrapped__.__qualname__)
+        self.assertEqual(inspect.signature(sa_int('a')(_test)), inspect.signature(_test))
+        self.assertEqual(_Test().method(1), 1)
+        with self.assertRaises(ValueError):
+            _Test().method(0)
+
+    def test_generated_source(self):
+        @sa_int('a', gt=-4, lte=4, non_zero=False)
+        @sa_string('b', starts_with='ab', not_empty=False)
+        def _test(a, b):
+            return
+
+        # Comparisons are inlined in the generated validator, rules which are turned off are left out
+        source = _test.__pytsa_source__
+        assert '-4 < val <= 4' in source
+        assert 'isinstance(val, str)' in source
+        assert 'val.startswith(\'ab\')' in source
+        assert 'len(val)' not in source
+        assert 'val == 0' not in source
+
+
+class TestEnableDisable(TestCase):
+
+    def tearDown(self):
+        pytsa.enable()
+
+    def _decorate(self):
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        return _test
+
+    def test_disable_all(self):
+        _test = self._decorate()
+        pytsa.disable()
+        self.assertEqual(_test(-1), -1)
+
+        # Functions decorated while disabled start disabled
+        _test_new = self._decorate()
+        self.assertEqual(_test_new(-1), -1)
+
+        pytsa.enable()
+        with self.assertRaises(ValueError):
+            _test(-1)
+        with self.assertRaises(ValueError):
+            _test_new(-1)
+
+    def test_disable_module(self):
+        _test = self._decorate()
+        pytsa.disable(_PACKAGE)
+        self.assertEqual(_test(-1), -1)
+        pytsa.enable(__name__)
+        with self.assertRaises(ValueError):
+            _test(-1)
+
+        # Module objects are accepted too, other modules are not affected
+        pytsa.disable(sys.modules[__name__])
+        self.assertEqual(_test(-1), -1)
+        pytsa.enable(_SIBLING)
+        self.assertEqual(_test(-1), -1)
+
+    def test_disable_function(self):
+        _test = self._decorate()
+        _test_other = self._decorate()
+        pytsa.disable(_test)
+        self.assertEqual(_test(-1), -1)
+        with self.assertRaises(ValueError):
+            _test_other(-1)
+
+        # Enabling all functions overrides the function, but the function overrides its module
+        pytsa.enable()
+        with self.assertRaises(ValueError):
+            _test(-1)
+        pytsa.disable(_PACKAGE)
+        pytsa.enable(_test)
+        with self.assertRaises(ValueError):
+            _test(-1)
+        self.assertEqual(_test_other(-1), -1)
+
+        with self.assertRaises(ValueError):
+            pytsa.disable(lambda a: a)
+
+    def test_disable_swaps_code(self):
+        # A disabled function does not check a flag, the code of its validator is replaced
+        _test = self._decorate()
+        validator = _test.__pytsa__.validator
+        code = validator.__code__
+        pytsa.disable(_test)
+        self.assertIsNot(validator.__code__, code)
+        self.assertNotIn('_type_error', validator.__code__.co_names)
+        pytsa.enable(_test)
+        self.assertIs(validator.__code__, code)
+
+
+class TestLazy(TestCase):
+
+    def setUp(self):
+        pytsa.set_lazy()
+
+    def tearDown(self):
+        pytsa.set_lazy(False)
+        pytsa.enable()
+
+    def test_compiled_on_first_call(self):
+        @sa_int('a', gt=0)
+        @sa_string('b', starts_with='x')
+        def _test(a, b):
+            return a
+
+        self.assertIsNone(_test.__pytsa__.source)
+        self.assertFalse(hasattr(_test, '__pytsa_source__'))
+        self.assertEqual(inspect.signature(_test), inspect.signature(_test.__wrapped__))
+
+        self.assertEqual(_test(1, 'x'), 1)
+        self.assertIn('val.startswith(\'x\')', _test.__pytsa_source__)
+        with self.assertRaises(ValueError):
+            _test(0, 'x')
+        with self.assertRaises(ValueError):
+            _test(1, 'y')
+
+    def test_rules_checked_on_first_call(self):
+        _test = sa_int('a', unknown_rule=True)(lambda a: a)
+        with self.assertRaises(ValueError):
+            _test(1)
+        with self.assertRaises(ValueError):
+            _test(1)
+        # Remove the invalid wrapper, so compile_all does not raise for it in other tests
+        del _test
+        gc.collect()
+
+    def test_compile_all(self):
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        self.assertIsNone(_test.__pytsa__.source)
+        pytsa.compile_all()
+        self.assertIsNotNone(_test.__pytsa__.source)
+        with self.assertRaises(ValueError):
+            _test(0)
+
+    def test_compiled_once(self):
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        start = threading.Barrier(8)
+
+        def _call():
+            start.wait()
+            _test(1)
+
+        with mock.patch('pytsa._base_rule._compile', wraps=pytsa._base_rule._compile) as compile_mock:
+            threads = [threading.Thread(target=_call) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(compile_mock.call_count, 1)
+
+    def test_disabled_before_first_call(self):
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        pytsa.disable(_test)
+        self.assertEqual(_test(0), 0)
+        self.assertIsNone(_test.__pytsa__.source)
+        pytsa.enable(_test)
+        with self.assertRaises(ValueError):
+            _test(0)
+
+
+class TestRegistry(TestCase):
+
+    def test_shared_contract(self):
+        before = pytsa.registry_stats()
+        _first = sa_string('name', regex='^[a-z]+$', not_blank=True)(lambda name: name)
+        _second = sa_string('name', regex='^[a-z]+$', not_blank=True)(lambda name, other=None: name)
+
+        # The contract, with its checks and compiled regex, is shared
+        contract = _first.__pytsa__.contracts[0]
+        self.assertIs(_second.__pytsa__.contracts[0], contract)
+        self.assertEqual(_first.__pytsa_source__, _second.__pytsa_source__.replace(', other=None', ''))
+        with self.assertRaises(ValueError):
+            _second('A')
+
+        stats = pytsa.registry_stats()
+        self.assertGreaterEqual(stats['reused'], before['reused'] + 1)
+        self.assertGreaterEqual(stats['bytes_saved'], before['bytes_saved'] + contract.size)
+        self.assertGreater(contract.size, 0)
+
+    def test_different_contracts(self):
+        contract = sa_int.contract
+        self.assertIsNot(contract('a', gt=1), contract('b', gt=1))
+        self.assertIsNot(contract('a', gt=1), contract('a', gt=2))
+        self.assertIsNot(contract('a', gt=1), contract('a', gt=1, allow_none=True))
+        self.assertIsNot(contract('a', gt=1), contract('a', gt=1, sample_rate=0.5))
+        self.assertIs(contract('a', gt=1), contract('a', gt=1, allow_none=False))
+        self.assertIsNot(sa_number.contract('a', gt=0), sa_number.contract('a', gt=0.0))
+
+        # Values which are equal but of another type are still checked
+        sa_int('a', sample_rate=1)
+        with self.assertRaises(TypeError):
+            sa_int('a', sample_rate=True)
+
+    def test_unhashable_rule_value(self):
+        sa_one_of = new_rule('sa_one_of', 'one of', {
+            'values': lambda arg_name, rule_val: pytsa._base_rule.Check('val not in {values}', ValueError,
+                                                                         values=rule_val)
+        }, 'True')
+        self.assertIsNot(sa_one_of.contract('a', values=[1, 2]), sa_one_of.contract('a', values=[1, 2]))
+        _test = sa_one_of('a', values=[1, 2])(lambda a: a)
+        self.assertEqual(_test(2), 2)
+        with self.assertRaises(ValueError):
+            _test(3)
+
+
+class TestAttribution(TestCase):
+
+    def test_traceback(self):
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        try:
+            _test(0)
+        except ValueError as err:
+            frame = traceback.extract_tb(err.__traceback__)[-1]
+        name = '{}.TestAttribution.test_traceback.<locals>._test'.format(__name__)
+        self.assertRegex(frame.filename, '^<pytsa:{}:[0-9a-f]{{8}}>$'.format(re.escape(name)))
+        self.assertEqual(frame.name, '_test')
+        self.assertEqual(frame.line, 'raise _rule_0_0_error(val)')
+
+    def test_traceback_same_name(self):
+        # Functions with the same name but other contracts, such as those of a factory, keep their own source
+        def _factory(rule):
+            @sa_int('a', **{rule: 0})
+            def _test(a):
+                return a
+
+            return _test
+
+        functions = [_factory('gt'), _factory('lt')]
+        for _test in functions:
+            filename = _test.__pytsa__.code.co_filename
+            self.assertEqual(linecache.getlines(filename), _test.__pytsa_source__.splitlines(True))
+        self.assertNotEqual(functions[0].__pytsa_source__, functions[1].__pytsa_source__)
+
+    def test_code_per_wrapper(self):
+        @sa_int('a', gt=0)
+        def _first(a):
+            return a
+
+        @sa_int('a', gt=0)
+        def _second(a):
+            return a
+
+        # The wrappers share the compiled source, but have a code object of their own
+        first, second = _first.__pytsa__.code, _second.__pytsa__.code
+        self.assertEqual(first.co_code, second.co_code)
+        self.assertNotEqual(first.co_filename, second.co_filename)
+        self.assertEqual(first.co_name, '_first')
+        if hasattr(first, 'co_qualname'):
+            self.assertEqual(first.co_qualname, _first.__qualname__)
+
+    def test_profile(self):
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        profile = cProfile.Profile()
+        profile.runcall(_test, 1)
+        profile.create_stats()
+        functions = [(filename, name) for filename, _, name in profile.stats]
+        self.assertIn((_test.__pytsa__.code.co_filename, '_test'), functions)
+        filename = _test.__pytsa__.code.co_filename
+        self.assertTrue(filename.startswith('<pytsa:{}.{}:'.format(__name__, _test.__qualname__)))
+        self.assertIn((__file__, '_test'), functions)
+
+
+class TestCostOrder(TestCase):
+
+    def test_cheap_rules_first(self):
+        contract = sa_path.contract('p', can_owner_read=True, is_abs=True)
+        self.assertEqual(contract.check_names, ['is_abs', 'can_owner_read'])
+        _test = sa_path('p', can_owner_read=True, is_abs=True)(lambda p: p)
+        with mock.patch('os.stat', side_effect=AssertionError('stat of a relative path')):
+            with self.assertRaisesRegex(ValueError, 'was not absolute'):
+                _test('relative/path')
+
+        self.assertEqual(sa_string.contract('s', regex='^a+$', not_empty=True).check_names, ['not_empty', 'regex'])
+        self.assertEqual(sa_string.contract('s', contains='a', is_lower=True, ends_with='a').check_names,
+                         ['ends_with', 'contains', 'is_lower'])
+        self.assertEqual(sa_list.contract('a', type=int, len=2).check_names, ['len', 'type'])
+        with self.assertRaisesRegex(ValueError, 'did not contain at least one'):
+            sa_string('s', regex='^a+$', not_empty=True)(lambda s: s)('')
+
+    def test_same_cost_in_given_order(self):
+        # Rules of the same cost class fail in the order they were given
+        with self.assertRaisesRegex(ValueError, 'did not start with'):
+            sa_string('s', starts_with='x', ends_with='y')(lambda s: s)('ab')
+        with self.assertRaisesRegex(ValueError, 'did not end with'):
+            sa_string('s', ends_with='y', starts_with='x')(lambda s: s)('ab')
+
+
+class TestOptimize(TestCase):
+    # Under python -O the decorators are stripped like assert statements
+
+    script = ('from pytsa import sa_int\n'
+              'def _test(a):\n'
+              '    return a\n'
+              'print(sa_int("a", gt=0)(_test) is _test)\n')
+
+    def _run(self, *flags, **env):
+        environ = dict(os.environ, **env)
+        return subprocess.check_output([sys.executable] + list(flags) + ['-c', self.script], env=environ,
+                                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                       universal_newlines=True).split()
+
+    def test_stripped_under_optimize(self):
+        self.assertEqual(self._run('-O'), ['True'])
+        self.assertEqual(self._run('-O', PYTSA_KEEP_UNDER_OPTIMIZE='True'), ['False'])
+        self.assertEqual(self._run(), ['False'])
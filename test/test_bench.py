@@ -0,0 +1,53 @@
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from unittest import TestCase
+
+from pytsa import bench
+
+
+class TestBench(TestCase):
+
+    def test_cases(self):
+        # Every case is measured on a valid value
+        names = set()
+        for name, rule, decorator, val in bench.cases():
+            self.assertEqual(decorator(bench._target)(val), val)
+            names.add(name)
+        self.assertEqual(names, {'sa_bool', 'sa_number', 'sa_type', 'sa_int', 'sa_float', 'sa_string', 'sa_list',
+                                 'sa_path'})
+
+    def test_stacked(self):
+        self.assertEqual(len(bench.stacked(4).__pytsa__.contracts), 4)
+        self.assertEqual(bench.stacked(7)(*(1,) * 7 + (5,)), 1)
+        with self.assertRaises(ValueError):
+            bench.stacked(8)(*(1,) * 7 + (5,))
+
+    def test_compare(self):
+        baseline = {'call/sa_int/gt': 100.0, 'memory/sa_int': 1000.0, 'import/eager': 50.0}
+        results = {'call/sa_int/gt': 130.0, 'memory/sa_int': 1100.0, 'import/lazy': 90.0}
+        self.assertEqual(bench.compare(results, baseline, 0.25), [('call/sa_int/gt', 100.0, 130.0)])
+        self.assertEqual(bench.compare(results, baseline, 0.5), [])
+
+    def test_main(self):
+        directory = tempfile.mkdtemp()
+        output = os.path.join(directory, 'results.json')
+        args = ['--number', '10', '--repeat', '1', '--functions', '10', '--memory-functions', '10']
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(bench.main(args + ['--json', output]), 0)
+        with open(output) as results:
+            results = json.load(results)['results']
+        self.assertIn('call/sa_path/exists', results)
+        self.assertIn('stacked/8', results)
+        self.assertIn('import/lazy', results)
+        self.assertIn('memory/sa_int', results)
+
+        # A baseline where everything was a lot faster fails the run
+        with open(output, 'w') as baseline:
+            json.dump({'results': dict((name, value / 100 if value > 0 else -1) for name, value in results.items())},
+                      baseline)
+        with redirect_stdout(io.StringIO()) as printed:
+            self.assertEqual(bench.main(args + ['--compare', output]), 1)
+        self.assertIn('results are more than 25% higher than in', printed.getvalue())
@@ -0,0 +1,201 @@
+import importlib
+import os
+import sys
+import tempfile
+from unittest import TestCase, mock, skipUnless
+
+from pytsa import import_hook
+from test.test_utils import run
+
+SOURCE = '''"""module docstring"""
+from __future__ import division
+import functools
+import pytsa
+from pytsa import sa_int, sa_string as string_rule, sa_list
+
+
+def keep_args(func):
+    @functools.wraps(func)
+    def _keep_args(a, b=None):
+        return func(a, b)
+    return _keep_args
+
+
+@sa_int('a', gt=0, lte=10)
+@string_rule('b', starts_with='x', allow_none=True)
+def rewritten(a, b=None):
+    """function docstring"""
+    return a
+
+
+@sa_int('a', gt=0)
+@keep_args
+def outer_decorator(a, b=None):
+    return a
+
+
+@keep_args
+@sa_int('a', gt=0)
+def inner_decorator(a, b=None):
+    return a
+
+
+@sa_list('a', type=float)
+def not_literal(a):
+    return a
+
+
+@sa_int('a', gt=0)
+def generator(a):
+    yield a
+
+
+@sa_int('a', gt=0)
+def nested_generator(a):
+    def _values():
+        yield a
+    return list(_values())
+'''
+
+ASYNC_SOURCE = '''
+
+@pytsa.sa_path('path', is_dir=True)
+async def rewritten_async(path, val=3):
+    return val
+'''
+
+# async def is new in Python 3.5
+if sys.version_info >= (3, 5):
+    SOURCE += ASYNC_SOURCE
+
+
+class TestImportHook(TestCase):
+
+    def _module(self):
+        namespace = {'__name__': 'test_import_hook_module'}
+        exec(import_hook.rewrite(SOURCE), namespace)
+        return namespace
+
+    def test_rewrite(self):
+        module = self._module()
+        rewritten = module['rewritten']
+
+        # The checks are in the function body, there is no wrapper
+        self.assertFalse(hasattr(rewritten, '__pytsa__'))
+        self.assertEqual(rewritten.__doc__, 'function docstring')
+        self.assertEqual(module['__doc__'], 'module docstring')
+
+        # Correct usage
+        self.assertEqual(rewritten(3), 3)
+        self.assertEqual(rewritten(10, 'xy'), 10)
+
+        # Incorrect usage, the same errors as the decorators
+        with self.assertRaisesRegex(ValueError, 'was not greater than 0'):
+            rewritten(0)
+        with self.assertRaisesRegex(ValueError, 'did not start with \'x\''):
+            rewritten(3, 'y')
+        with self.assertRaises(TypeError):
+            rewritten(3, 3)
+        with self.assertRaises(ValueError):
+            rewritten(None)
+
+    def test_docstring(self):
+        # Without __future__ imports the values are defined right after the docstring
+        namespace = {'__name__': 'test_import_hook_docstring'}
+        exec(import_hook.rewrite(SOURCE.replace('from __future__ import division\n', '')), namespace)
+        self.assertEqual(namespace['__doc__'], 'module docstring')
+        with self.assertRaises(ValueError):
+            namespace['rewritten'](0)
+
+    @skipUnless(sys.version_info >= (3, 5), 'async def is new in Python 3.5')
+    def test_rewrite_async(self):
+        rewritten_async = self._module()['rewritten_async']
+        self.assertFalse(hasattr(rewritten_async, '__pytsa__'))
+
+        # The local 'val' of the function is not touched by the checks
+        self.assertEqual(run(rewritten_async(tempfile.gettempdir())), 3)
+        with self.assertRaisesRegex(ValueError, 'was not a directory'):
+            run(rewritten_async(os.path.join(tempfile.gettempdir(), 'non-existent')))
+
+    def test_not_rewritten(self):
+        module = self._module()
+
+        # Decorators applied after another decorator and rules which are not literals are left as they are
+        self.assertTrue(hasattr(module['outer_decorator'], '__pytsa__'))
+        self.assertTrue(hasattr(module['not_literal'], '__pytsa__'))
+        with self.assertRaises(ValueError):
+            module['outer_decorator'](0)
+        with self.assertRaises(ValueError):
+            module['not_literal']([1.0, None])
+
+        # The innermost decorators are rewritten, below the other decorators
+        self.assertFalse(hasattr(module['inner_decorator'], '__pytsa__'))
+        self.assertFalse(hasattr(module['inner_decorator'].__wrapped__, '__pytsa__'))
+        with self.assertRaises(ValueError):
+            module['inner_decorator'](0)
+
+    def test_generator_not_rewritten(self):
+        module = self._module()
+
+        # The body of a generator only runs on the first next(), the decorator checks the arguments on the call
+        self.assertTrue(hasattr(module['generator'], '__pytsa__'))
+        with self.assertRaisesRegex(ValueError, 'was not greater than 0'):
+            module['generator'](-1)
+        self.assertEqual(list(module['generator'](1)), [1])
+
+        # A generator defined in the body does not make the function a generator
+        self.assertFalse(hasattr(module['nested_generator'], '__pytsa__'))
+        with self.assertRaises(ValueError):
+            module['nested_generator'](-1)
+
+    def test_install(self):
+        directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(directory, 'hook_package'))
+        with open(os.path.join(directory, 'hook_package', '__init__.py'), 'w') as f:
+            f.write('')
+        with open(os.path.join(directory, 'hook_package', 'module.py'), 'w') as f:
+            f.write(SOURCE)
+
+        sys.path.insert(0, directory)
+        self.addCleanup(sys.path.remove, directory)
+        self.addCleanup(import_hook.uninstall)
+        self.addCleanup(lambda: [sys.modules.pop(name, None) for name in ('hook_package', 'hook_package.module')])
+
+        import_hook.install('hook_package')
+        with mock.patch('sys.dont_write_bytecode', False), \
+                mock.patch('pytsa.import_hook.rewrite', wraps=import_hook.rewrite) as rewrite:
+            module = importlib.import_module('hook_package.module')
+            self.assertFalse(hasattr(module.rewritten, '__pytsa__'))
+            self.assertEqual(rewrite.call_count, 2)
+
+            # The rewritten code is cached, the next import does not rewrite the module again
+            del sys.modules['hook_package.module']
+            module = importlib.import_module('hook_package.module')
+            self.assertEqual(rewrite.call_count, 2)
+            with self.assertRaises(ValueError):
+                module.rewritten(0)
+
+        cached = os.listdir(os.path.join(directory, 'hook_package', '__pycache__'))
+        self.assertTrue(any('.opt-pytsa' in name for name in cached))
+
+        # Other packages are imported as usual
+        self.assertIsNone(import_hook._finder.find_spec('json'))
+
+    def test_cache_path_without_optimization(self):
+        cache_from_source = importlib.util.cache_from_source
+
+        def _cache_from_source(path, **kw):
+            # As before Python 3.5, without the optimization argument
+            if 'optimization' in kw:
+                raise TypeError('cache_from_source() got an unexpected keyword argument \'optimization\'')
+            return cache_from_source(path)
+
+        source = os.path.join(tempfile.gettempdir(), 'module.py')
+        expected = cache_from_source(source, optimization='pytsa0')
+        with mock.patch('importlib.util.cache_from_source', _cache_from_source):
+            self.assertEqual(import_hook._cache_from_source(source, 'pytsa0'), expected)
+
+    def test_install_stripped(self):
+        with mock.patch.dict('os.environ', {'PYTSA_DISABLED': 'True'}):
+            import_hook.install('hook_package')
+        self.assertIsNone(import_hook._finder)
@@ -0,0 +1,68 @@
+import urllib.error
+import urllib.request
+from unittest import TestCase
+
+from pytsa import sa_int, metrics, profiling
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        profiling.reset()
+        profiling.start()
+
+    def tearDown(self):
+        profiling.stop()
+        profiling.reset()
+
+    def _validate(self):
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        _test(1)
+        _test(2)
+        with self.assertRaises(ValueError):
+            _test(0)
+        return __name__ + '.TestMetrics._validate.<locals>._test'
+
+    def test_render(self):
+        function = self._validate()
+        text = metrics.render()
+        lines = text.splitlines()
+
+        self.assertEqual(lines[-1], '# EOF')
+        self.assertIn('# TYPE pytsa_validations counter', lines)
+        self.assertIn('# TYPE pytsa_validation_seconds histogram', lines)
+        self.assertIn('# UNIT pytsa_validation_seconds seconds', lines)
+        labels = 'function="{}",parameter="a",rule="gt"'.format(function)
+        self.assertIn('pytsa_validations_total{{{},outcome="pass"}} 2'.format(labels), lines)
+        self.assertIn('pytsa_validations_total{{{},outcome="fail"}} 1'.format(labels), lines)
+        self.assertIn('pytsa_validation_seconds_bucket{{{},le="+Inf"}} 3'.format(labels), lines)
+        self.assertIn('pytsa_validation_seconds_count{{{}}} 3'.format(labels), lines)
+        self.assertIn('pytsa_function_validations_total{{function="{}",outcome="fail"}} 1'.format(function), lines)
+
+        # Buckets are cumulative
+        buckets = [int(line.rsplit(' ', 1)[1]) for line in lines
+                   if line.startswith('pytsa_validation_seconds_bucket{' + labels)]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(len(buckets), len(metrics.BUCKETS_NS) + 1)
+
+    def test_escape_labels(self):
+        stats = {'a"b\\c\nd': {'calls': 1, 'failures': 0, 'total_ns': 10, 'max_ns': 10,
+                               'histogram': {15: 1}, 'arguments': {}}}
+        self.assertIn('pytsa_function_validations_total{function="a\\"b\\\\c\\nd",outcome="pass"} 1',
+                      metrics.render(stats))
+
+    def test_serve(self):
+        function = self._validate()
+        server = metrics.serve(0, '127.0.0.1')
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+        with urllib.request.urlopen(url + '/metrics') as response:
+            self.assertEqual(response.headers['Content-Type'], metrics.CONTENT_TYPE)
+            self.assertIn(function, response.read().decode('utf-8'))
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + '/other')
@@ -0,0 +1,176 @@
+import tempfile
+import threading
+from unittest import TestCase, mock
+
+import pytsa
+from pytsa import sa_int, sa_path, sa_string, profiling, _histogram
+
+
+class TestProfiling(TestCase):
+
+    def setUp(self):
+        profiling.reset()
+        profiling.start()
+
+    def tearDown(self):
+        profiling.stop()
+        profiling.configure()
+        profiling.reset()
+
+    def test_stats(self):
+        @sa_int('a', gt=0, lt=10, mod=2)
+        @sa_string('b', not_empty=True, allow_none=True)
+        def _test(a, b=None):
+            return a
+
+        _test(2)
+        _test(4, 'x')
+        with self.assertRaises(ValueError):
+            _test(3)
+        with self.assertRaises(TypeError):
+            _test('4')
+        with self.assertRaises(ValueError):
+            _test(4, '')
+
+        stats = pytsa.stats()[__name__ + '.TestProfiling.test_stats.<locals>._test']
+        self.assertEqual((stats['calls'], stats['failures']), (5, 3))
+        self.assertGreater(stats['total_ns'], 0)
+        self.assertGreaterEqual(stats['total_ns'], stats['max_ns'])
+
+        # Folded rules are counted together, under the names of all of them
+        arguments = stats['arguments']
+        self.assertEqual(sorted(arguments['a']), ['gt+lt', 'mod', 'type'])
+        self.assertEqual((arguments['a']['type']['calls'], arguments['a']['type']['failures']), (5, 1))
+        self.assertEqual((arguments['a']['gt+lt']['calls'], arguments['a']['gt+lt']['failures']), (4, 0))
+        self.assertEqual((arguments['a']['mod']['calls'], arguments['a']['mod']['failures']), (4, 1))
+        # Checks of None values which are allowed are skipped
+        self.assertEqual((arguments['b']['not_empty']['calls'], arguments['b']['not_empty']['failures']), (2, 1))
+
+    def test_clock_without_perf_counter_ns(self):
+        # Before Python 3.7 the times are taken from time.perf_counter
+        with mock.patch.object(profiling, '_clock', profiling._perf_counter_ns):
+            @sa_int('a', gt=0)
+            def _test(a):
+                return a
+
+            _test(1)
+        self.assertIsInstance(profiling._perf_counter_ns(), int)
+        entry = pytsa.stats()[__name__ + '.' + _test.__qualname__]['arguments']['a']['gt']
+        self.assertEqual(entry['calls'], 1)
+        self.assertGreaterEqual(entry['max_ns'], 0)
+
+    def test_check_raising_itself(self):
+        @sa_path('p', is_dir=True)
+        def _test(p):
+            return p
+
+        _test(tempfile.gettempdir())
+        with self.assertRaises(ValueError):
+            _test(tempfile.gettempdir() + '/non-existent')
+
+        stats = pytsa.stats()[__name__ + '.TestProfiling.test_check_raising_itself.<locals>._test']
+        self.assertEqual((stats['calls'], stats['failures']), (2, 1))
+        self.assertEqual(stats['arguments']['p']['is_dir']['failures'], 1)
+
+    def test_threads(self):
+        @sa_int('a')
+        def _test(a):
+            return a
+
+        threads = [threading.Thread(target=lambda: [_test(1) for _ in range(100)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        _test(1)
+
+        self.assertEqual(pytsa.stats()[__name__ + '.TestProfiling.test_threads.<locals>._test']['calls'], 401)
+
+    def test_start_stop_reset(self):
+        @sa_int('a')
+        def _test(a):
+            return a
+
+        name = __name__ + '.TestProfiling.test_start_stop_reset.<locals>._test'
+        _test(1)
+        profiling.stop()
+        self.assertNotIn('_clock', _test.__pytsa_source__)
+        _test(1)
+        self.assertEqual(pytsa.stats()[name]['calls'], 1)
+
+        profiling.reset()
+        self.assertNotIn(name, pytsa.stats())
+
+        # Functions decorated before profiling started are profiled as well
+        profiling.start()
+        _test(1)
+        self.assertEqual(pytsa.stats()[name]['calls'], 1)
+
+    def test_histogram(self):
+        @sa_int('a', mod=2)
+        def _test(a):
+            return a
+
+        for a in range(100):
+            try:
+                _test(a)
+            except ValueError:
+                pass
+
+        stats = pytsa.stats()[__name__ + '.TestProfiling.test_histogram.<locals>._test']
+        for entry in [stats, stats['arguments']['a']['mod']]:
+            self.assertEqual(sum(entry['histogram'].values()), 100)
+            self.assertLessEqual(entry['p50_ns'], entry['p90_ns'])
+            self.assertLessEqual(entry['p90_ns'], entry['p99_ns'])
+            self.assertIn(entry['p99_ns'], entry['histogram'])
+            # The bucket of the maximum time is at most an eighth above it
+            self.assertLessEqual(max(entry['histogram']), entry['max_ns'] * 9 / 8)
+            self.assertGreaterEqual(max(entry['histogram']), entry['max_ns'])
+
+    def test_slow_log(self):
+        @sa_string('b', not_empty=True)
+        def _test(b):
+            return b
+
+        _test('fast')
+        profiling.configure(slow_threshold=0)
+        with self.assertLogs('pytsa', 'WARNING') as logs:
+            _test('x' * 1000)
+        self.assertEqual(len(logs.records), 2)
+        self.assertRegex(logs.output[1], 'slow validation of rule not_empty of argument \'b\' of '
+                                         r".*test_slow_log.<locals>._test took .*us, with value 'x+\.\.\.x+'$")
+        self.assertLess(len(logs.output[1]), 300)
+
+        with self.assertRaises(ValueError):
+            profiling.configure(slow_threshold=-1)
+
+
+class TestHistogram(TestCase):
+
+    def test_buckets(self):
+        previous = -1
+        powers = [(1 << shift) + offset for shift in range(12, 40) for offset in (-1, 0, 1)]
+        for ns in sorted(list(range(5000)) + powers):
+            bucket = _histogram.index(ns)
+            self.assertGreaterEqual(bucket, previous)
+            self.assertLess(bucket, _histogram.SIZE)
+            if ns <= _histogram.MAX_NS:
+                self.assertLessEqual(ns, _histogram.upper_bound(bucket))
+                self.assertLessEqual(_histogram.upper_bound(bucket) - ns, ns / _histogram.SUB_BUCKETS)
+            previous = bucket
+        self.assertEqual(_histogram.upper_bound(_histogram.SIZE - 1), _histogram.MAX_NS)
+
+    def test_merge_and_percentile(self):
+        first = _histogram.new()
+        second = _histogram.new()
+        for ns in range(1, 91):
+            first[_histogram.index(ns)] += 1
+        for ns in range(91, 101):
+            second[_histogram.index(ns)] += 1
+        _histogram.merge(first, second)
+
+        self.assertEqual(sum(first), 100)
+        self.assertEqual(_histogram.percentile(first, 50), 51)
+        self.assertEqual(_histogram.percentile(first, 100), 103)
+        self.assertEqual(_histogram.percentile(_histogram.new(), 99), 0)
+        self.assertEqual(sum(_histogram.sparse(first).values()), 100)
@@ -1,7 +1,6 @@
+import inspect
 from unittest import TestCase, mock
 
-import decorator
-
 from pytsa import sa_bool
 
 
@@ -87,7 +86,7 @@ class TestSaBoolBase(TestCase):
             return a
 
         _test_signature = sa_bool('a')(_test)
-        assert decorator.getfullargspec(_test) == decorator.getfullargspec(_test_signature)
+        assert inspect.getfullargspec(_test) == inspect.getfullargspec(_test_signature)
 
     def test_call_with_kwargs(self):
         @sa_bool('b')
@@ -1,7 +1,6 @@
+import inspect
 from unittest import TestCase, mock
 
-import decorator
-
 from pytsa import sa_float
 from test.test_utils import test_boolean_parameter, test_number_parameter
 
@@ -327,7 +326,7 @@ class TestSaFloatBase(TestCase):
             return a
 
         _test_signature = sa_float('a')(_test)
-        assert decorator.getfullargspec(_test) == decorator.getfullargspec(_test_signature)
+        assert inspect.getfullargspec(_test) == inspect.getfullargspec(_test_signature)
 
     def test_call_with_kwargs(self):
         @sa_float('b')
@@ -447,3 +446,8 @@ class TestSaFloatMultipleRules(TestCase):
         for incorrect_float in incorrect_floats:
             with self.assertRaises(ValueError):
                 _test(incorrect_float)
+
+    def test_bounds_empty_interval(self):
+        # bounds which no value can abide by are rejected when applying the decorator
+        with self.assertRaises(ValueError):
+            sa_float('a', gt=5.0, lt=3.0)
@@ -1,7 +1,6 @@
+import inspect
 from unittest import TestCase, mock
 
-import decorator
-
 from pytsa import sa_int
 from test.test_utils import test_boolean_parameter, test_number_parameter
 
@@ -295,6 +294,11 @@ class TestSaIntBase(TestCase):
 
             _test(1)
 
+    def test_args_name_missing_on_decoration(self):
+        # the unknown argument name should be reported when the decorator is applied, not on the first call
+        with self.assertRaises(ValueError):
+            sa_int('b')(lambda a: a)
+
     def test_incorrect_rule(self):
         # if an unknown rule is provided, throw an exception
         with self.assertRaises(ValueError):
@@ -325,7 +329,7 @@ class TestSaIntBase(TestCase):
             return a
 
         _test_signature = sa_int('a')(_test)
-        assert decorator.getfullargspec(_test) == decorator.getfullargspec(_test_signature)
+        assert inspect.getfullargspec(_test) == inspect.getfullargspec(_test_signature)
 
     def test_call_with_kwargs(self):
         @sa_int('b')
@@ -445,3 +449,8 @@ class TestSaIntMultipleRules(TestCase):
         for incorrect_int in incorrect_ints:
             with self.assertRaises(ValueError):
                 _test(incorrect_int)
+
+    def test_bounds_empty_interval(self):
+        # bounds which no value can abide by are rejected when applying the decorator
+        with self.assertRaises(ValueError):
+            sa_int('a', gt=5, lt=3)
@@ -1,7 +1,6 @@
+import inspect
 from unittest import TestCase, mock
 
-import decorator
-
 from pytsa import sa_list
 from test.test_utils import test_int_parameter, test_type_parameter, test_boolean_parameter
 
@@ -48,7 +47,7 @@ class TestSaListRules(TestCase):
             return a
 
         _test_signature = sa_list('a')(_test)
-        assert decorator.getfullargspec(_test) == decorator.getfullargspec(_test_signature)
+        assert inspect.getfullargspec(_test) == inspect.getfullargspec(_test_signature)
 
     def test_call_with_kwargs(self):
         @sa_list('b')
@@ -252,7 +251,7 @@ class TestSaListBase(TestCase):
             return a
 
         _test_signature = sa_list('a')(_test)
-        assert decorator.getfullargspec(_test) == decorator.getfullargspec(_test_signature)
+        assert inspect.getfullargspec(_test) == inspect.getfullargspec(_test_signature)
 
     def test_call_with_kwargs(self):
         @sa_list('b')
@@ -1,7 +1,6 @@
+import inspect
 from unittest import TestCase, mock
 
-import decorator
-
 from pytsa import sa_number
 from test.test_utils import test_number_parameter, test_boolean_parameter
 
@@ -351,7 +350,7 @@ class TestSaNumberBase(TestCase):
             return a
 
         _test_signature = sa_number('a')(_test)
-        assert decorator.getfullargspec(_test) == decorator.getfullargspec(_test_signature)
+        assert inspect.getfullargspec(_test) == inspect.getfullargspec(_test_signature)
 
     def test_call_with_kwargs(self):
         @sa_number('b')
@@ -471,3 +470,34 @@ class TestSaNumberMultipleRules(TestCase):
         for incorrect_number in incorrect_numbers:
             with self.assertRaises(ValueError):
                 _test(incorrect_number)
+
+    def test_bounds_redundant(self):
+        # bounds which are implied by a stricter bound on the same side are left out
+        @sa_number('a', gt=0, gte=-1, lte=4, lt=5.5)
+        def _test(a):
+            return a
+
+        _test(0.1)
+        _test(4)
+
+        with self.assertRaisesRegex(ValueError, 'not greater than 0'):
+            _test(-0.5)
+        with self.assertRaisesRegex(ValueError, 'not lesser than or equal to 4'):
+            _test(5)
+
+    def test_bounds_empty_interval(self):
+        # bounds which no value can abide by are rejected when applying the decorator
+        with self.assertRaises(ValueError):
+            sa_number('a', gt=5, lt=3)
+        with self.assertRaises(ValueError):
+            sa_number('a', gte=3, lt=3)
+        with self.assertRaises(ValueError):
+            sa_number('a', gt=3.0, lte=3)
+
+        @sa_number('a', gte=3, lte=3.0)
+        def _test(a):
+            return a
+
+        _test(3)
+        with self.assertRaises(ValueError):
+            _test(3.1)
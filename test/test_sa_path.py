@@ -1,10 +1,14 @@
+import inspect
+import os
+import pathlib
+import sys
 import tempfile
+import threading
+import time
 from os import path, chmod
 from unittest import TestCase, mock
 
-import decorator
-
-from pytsa import sa_path
+from pytsa import sa_path, PathValidationTimeout, _timeout
 from test.test_utils import test_boolean_parameter
 
 
@@ -279,6 +283,190 @@ class TestSaPathRules(TestCase):
     def test_rule_can_others_execute_true(self):
         self._test_permissions('can_others_execute', 0o0776)
 
+    def test_rules_stat_once(self):
+        self._create_test_file_structure()
+
+        @sa_path('a', exists=True, is_file=True, can_owner_read=True, can_group_read=True)
+        def _test(a):
+            return a
+
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            _test(self.test_file)
+            self.assertEqual(os_stat.call_count, 1)
+
+        # Incorrect usage, the error names the first failing rule
+        with self.assertRaisesRegex(ValueError, 'was not a file'):
+            _test(self.test_dir)
+
+        chmod(self.test_file, 0o0737)
+        with self.assertRaisesRegex(ValueError, 'was not readable for group'):
+            _test(self.test_file)
+
+        chmod(self.test_file, 0o0337)
+        with self.assertRaisesRegex(ValueError, 'was not readable for owner'):
+            _test(self.test_file)
+
+    def test_rules_path_types(self):
+        self._create_test_file_structure()
+
+        @sa_path('a', exists=True, is_file=True, is_abs=True, can_owner_read=True)
+        def _test(a):
+            return a
+
+        # Correct usage
+        _test(self.test_file)
+        _test(os.fsencode(self.test_file))
+        _test(pathlib.Path(self.test_file))
+
+        # Incorrect usage, is dir
+        with self.assertRaises(ValueError):
+            _test(pathlib.Path(self.test_dir))
+        with self.assertRaises(ValueError):
+            _test(os.fsencode(self.test_dir))
+
+    def test_rules_path_types_without_fspath(self):
+        self._create_test_file_structure()
+        module = sys.modules['pytsa.sa_path']
+        os_stat, os_isabs = os.stat, os.path.isabs
+
+        def _str_only(func):
+            # As the os functions before Python 3.6
+            def _func(val, *args, **kw):
+                if not isinstance(val, (str, bytes)):
+                    raise TypeError('expected str or bytes, not {}'.format(type(val)))
+                return func(val, *args, **kw)
+            return _func
+
+        with mock.patch.object(module, '_os_path', module._str_path), mock.patch('os.stat', _str_only(os_stat)), \
+                mock.patch('os.path.isabs', _str_only(os_isabs)):
+            @sa_path('a', exists=True, is_file=True, is_abs=True, can_owner_read=True)
+            def _test(a):
+                return a
+
+            _test(pathlib.Path(self.test_file))
+            with self.assertRaisesRegex(ValueError, 'was not a file'):
+                _test(pathlib.Path(self.test_dir))
+            with self.assertRaisesRegex(ValueError, 'was not absolute'):
+                _test(pathlib.PurePath('relative'))
+
+    def test_rule_timeout(self):
+        self._create_test_file_structure()
+        self.addCleanup(_timeout.clear)
+
+        @sa_path('a', is_file=True, timeout=0.05)
+        def _test(a):
+            return a
+
+        # Correct usage
+        _test(self.test_file)
+        with self.assertRaises(ValueError):
+            _test(self.test_dir)
+
+        # A stat which does not return in time raises PathValidationTimeout
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def _hung_stat(*args, **kwargs):
+            release.wait(5)
+            raise OSError('stat on a hung mount')
+
+        with mock.patch('os.stat', side_effect=_hung_stat) as os_stat:
+            with self.assertRaisesRegex(PathValidationTimeout, 'could not be stat within 0.05 seconds'):
+                _test(self.test_file)
+            # The mount is remembered, later calls on it fail fast without another stat
+            with self.assertRaisesRegex(PathValidationTimeout, 'timed out recently'):
+                _test(self.test_file)
+            self.assertEqual(os_stat.call_count, 1)
+
+        # Once the mount is no longer considered hung, the path is stat again
+        _timeout.clear()
+        _test(self.test_file)
+
+    def test_rule_timeout_stat_blocked(self):
+        self._create_test_file_structure()
+        self.addCleanup(_timeout.clear)
+
+        @sa_path('a', is_file=True, timeout=0.05)
+        def _test(a):
+            return a
+
+        release = threading.Event()
+        self.addCleanup(release.set)
+        os_stat = os.stat
+        test_file = os.path.abspath(self.test_file)
+        pool = _timeout._Pool(1)
+
+        def _hung_stat(*args, **kwargs):
+            release.wait(5)
+            return os_stat(*args, **kwargs)
+
+        def _wait(done):
+            deadline = time.monotonic() + 5
+            while not done() and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        with mock.patch.object(_timeout, 'HUNG_MOUNT_TTL', 0), mock.patch.object(_timeout, '_pool', pool), \
+                mock.patch('os.stat', side_effect=_hung_stat) as stat:
+            with self.assertRaisesRegex(PathValidationTimeout, 'could not be stat within'):
+                _test(self.test_file)
+            # After the ttl the mount is still hung while its stat is blocked, no other thread blocks on it
+            with self.assertRaisesRegex(PathValidationTimeout, 'timed out recently'):
+                _test(self.test_file)
+            self.assertEqual(stat.call_count, 1)
+
+            # Once the stat returns, the mount is stat again
+            release.set()
+            _wait(lambda: _timeout.hung_mount(test_file) is None)
+            _test(self.test_file)
+            self.assertEqual(stat.call_count, 2)
+
+            # A stat still waiting for a thread when it times out is dropped, and does not mark its mount as hung
+            release.clear()
+            with self.assertRaises(PathValidationTimeout):
+                _test(self.test_file)
+            _timeout.clear()
+            with self.assertRaisesRegex(PathValidationTimeout, 'could not be stat within'):
+                _test(self.test_file)
+            self.assertIsNone(_timeout.hung_mount(test_file))
+            release.set()
+            _wait(lambda: pool._idle == 1)
+            self.assertEqual(stat.call_count, 3)
+
+    def test_rule_timeout_takes_positive_number(self):
+        with self.assertRaises(ValueError):
+            sa_path('a', timeout=0)
+        with self.assertRaises(ValueError):
+            sa_path('a', timeout=None)
+        with self.assertRaises(TypeError):
+            sa_path('a', timeout='1')
+
+    def test_rules_dir_entry(self):
+        self._create_test_file_structure()
+        os.mkdir(path.join(self.test_dir, 'sub_dir'))
+
+        @sa_path('a', exists=True, is_file=True)
+        def _test(a):
+            return a
+
+        entries = {entry.name: entry for entry in os.scandir(self.test_dir)}
+
+        # The type of the entry is known from the directory listing, no stat is needed
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            _test(entries['test.txt'])
+            self.assertEqual(os_stat.call_count, 0)
+
+        # Incorrect usage, is dir
+        with self.assertRaises(ValueError):
+            _test(entries['sub_dir'])
+
+        @sa_path('a', is_dir=True, can_owner_write=True)
+        def _test_permission(a):
+            return a
+
+        _test_permission(entries['sub_dir'])
+        with self.assertRaises(ValueError):
+            _test_permission(entries['test.txt'])
+
     def test_rule_allow_none_true(self):
         self._create_test_file_structure()
 
@@ -373,7 +561,7 @@ class TestSaPathBase(TestCase):
             return a
 
         _test_signature = sa_path('a')(_test)
-        assert decorator.getfullargspec(_test) == decorator.getfullargspec(_test_signature)
+        assert inspect.getfullargspec(_test) == inspect.getfullargspec(_test_signature)
 
     def test_call_with_kwargs(self):
         @sa_path('b')
@@ -456,3 +644,7 @@ class TestSaPathBase(TestCase):
         # not type
         with self.assertRaises(TypeError):
             _test(str)
+
+        # bytes and path-like objects are accepted
+        _test(b'./')
+        _test(pathlib.PurePath('./'))
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+from os import path, chmod
+from unittest import TestCase, mock
+
+from pytsa import sa_paths
+from pytsa.sa_paths import InvalidPaths
+from test.test_utils import test_boolean_parameter
+
+
+class TestSaPathsParameters(TestCase):
+    # Test that the decorator only accepts the correct parameters
+
+    def test_rule_exists_takes_boolean(self):
+        test_boolean_parameter(self, sa_paths, 'exists')
+
+    def test_rule_can_owner_read_takes_boolean(self):
+        test_boolean_parameter(self, sa_paths, 'can_owner_read')
+
+    def test_rule_workers_takes_positive_int(self):
+        sa_paths('a', workers=4)
+        with self.assertRaises(ValueError):
+            sa_paths('a', workers=0)
+        with self.assertRaises(TypeError):
+            sa_paths('a', workers=2.0)
+
+
+class TestSaPathsRules(TestCase):
+    # Test that the rules for sa_paths works as specified
+
+    def setUp(self):
+        """
+        Create a file structure for testing
+        /temp_dir
+            /dir_0 ... /dir_3
+                /test_0.txt ... /test_9.txt
+        """
+        self.test_dir = tempfile.mkdtemp()
+        self.test_files = []
+        for i in range(4):
+            test_sub_dir = path.join(self.test_dir, 'dir_{}'.format(i))
+            os.mkdir(test_sub_dir)
+            for j in range(10):
+                test_file = path.join(test_sub_dir, 'test_{}.txt'.format(j))
+                with open(test_file, 'w') as f:
+                    f.write('Temp test file')
+                self.test_files.append(test_file)
+
+    def test_rules(self):
+        @sa_paths('a', exists=True, is_file=True, is_abs=True)
+        def _test(a):
+            return a
+
+        # Correct usage
+        _test([])
+        _test(self.test_files)
+
+        # Incorrect usage, every invalid index is reported
+        paths = self.test_files + [self.test_dir, './test.txt', path.join(self.test_dir, 'non-existent.txt'), None, 3]
+        with self.assertRaises(InvalidPaths) as context:
+            _test(paths)
+        self.assertEqual([index for index, _ in context.exception.failures], [40, 41, 42, 43, 44])
+        self.assertIsInstance(context.exception.failures[1][1], ValueError)
+        self.assertIsInstance(context.exception.failures[4][1], TypeError)
+        self.assertIn('index 40', str(context.exception))
+
+        # Incorrect usage, not a list
+        with self.assertRaises(TypeError):
+            _test(self.test_files[0])
+
+    def test_scan_directory_once(self):
+        @sa_paths('a', is_file=True)
+        def _test(a):
+            return a
+
+        # The file types are taken from a single listing of every directory
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            _test(self.test_files)
+            self.assertEqual(os_stat.call_count, 0)
+
+        with self.assertRaises(InvalidPaths):
+            _test(self.test_files + [path.join(self.test_dir, 'dir_0')])
+
+    def test_permissions(self):
+        @sa_paths('a', can_owner_write=True, workers=2)
+        def _test(a):
+            return a
+
+        _test(self.test_files)
+
+        chmod(self.test_files[3], 0o0577)
+        chmod(self.test_files[25], 0o0577)
+        with self.assertRaises(InvalidPaths) as context:
+            _test(self.test_files)
+        self.assertEqual([index for index, _ in context.exception.failures], [3, 25])
+        self.assertIn('was not writeable for owner', str(context.exception))
+
+    def test_one_directory_concurrently(self):
+        @sa_paths('a', can_owner_read=True, workers=4)
+        def _test(a):
+            return a
+
+        # The paths of a single directory are stat in chunks on the threads of the pool
+        threads = set()
+        os_stat = os.stat
+
+        def _stat(*args, **kw):
+            threads.add(threading.current_thread().name)
+            return os_stat(*args, **kw)
+
+        paths = [path.join(self.test_dir, 'dir_0', 'test_{}.txt'.format(index % 10)) for index in range(200)]
+        with mock.patch('os.stat', _stat):
+            _test(paths)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread().name, threads)
+
+    def test_allow_none(self):
+        @sa_paths('a', exists=True, allow_none=True)
+        def _test(a):
+            return a
+
+        _test(None)
+        with self.assertRaises(InvalidPaths):
+            _test([None])
@@ -1,7 +1,6 @@
+import inspect
 from unittest import TestCase, mock
 
-import decorator
-
 from pytsa import sa_string
 from test.test_utils import test_boolean_parameter, test_string_parameter
 
@@ -338,7 +337,7 @@ class TestSaStringBase(TestCase):
             return a
 
         _test_signature = sa_string('a')(_test)
-        assert decorator.getfullargspec(_test) == decorator.getfullargspec(_test_signature)
+        assert inspect.getfullargspec(_test) == inspect.getfullargspec(_test_signature)
 
     def test_call_with_kwargs(self):
         @sa_string('b')
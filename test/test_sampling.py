@@ -0,0 +1,127 @@
+from unittest import TestCase, mock
+
+from pytsa import sa_int, sa_string, sampling
+
+
+class TestSampling(TestCase):
+
+    def tearDown(self):
+        sampling.configure()
+
+    def _count_errors(self, func, calls):
+        errors = 0
+        for _ in range(calls):
+            try:
+                func(-1)
+            except ValueError:
+                errors += 1
+        return errors
+
+    def test_rule_sample_rate(self):
+        @sa_int('a', gt=0, sample_rate=0.25)
+        def _test(a):
+            return a
+
+        # The first call and every 4th call after it are validated, and fail the same as without sampling
+        with self.assertRaisesRegex(ValueError, 'was not greater than 0'):
+            _test(-1)
+        _test(-1)
+        _test(-1)
+        _test(-1)
+        with self.assertRaises(ValueError):
+            _test(-1)
+        self.assertEqual(self._count_errors(_test, 400), 100)
+        self.assertIn('sample_rate=0.25', _test.__pytsa_source__)
+
+    def test_rule_sample_rate_fraction(self):
+        # Rates which are not 1/k validate exactly that fraction of the calls, the first call included
+        for rate, validated in ((0.7, 70), (0.9, 90), (0.6, 60), (0.4, 40), (0.35, 35)):
+            @sa_int('a', gt=0, sample_rate=rate)
+            def _test(a):
+                return a
+
+            with self.assertRaises(ValueError):
+                _test(-1)
+            self.assertEqual(self._count_errors(_test, 99), validated - 1)
+            self.assertEqual(self._count_errors(_test, 100), validated)
+
+    def test_rule_sample_rate_edges(self):
+        @sa_int('a', gt=0, sample_rate=1)
+        def _test_all(a):
+            return a
+
+        @sa_int('a', gt=0, sample_rate=0)
+        def _test_none(a):
+            return a
+
+        self.assertEqual(self._count_errors(_test_all, 10), 10)
+        self.assertEqual(self._count_errors(_test_none, 10), 0)
+
+    def test_rule_sample_rate_takes_rate(self):
+        with self.assertRaises(ValueError):
+            sa_int('a', sample_rate=1.5)
+        with self.assertRaises(ValueError):
+            sa_int('a', sample_rate=-0.1)
+        with self.assertRaises(TypeError):
+            sa_int('a', sample_rate='0.5')
+        with self.assertRaises(TypeError):
+            sa_int('a', sample_rate=True)
+
+    def test_stacked_decorators(self):
+        # The highest sample rate of the stacked decorators applies to the whole function
+        @sa_int('a', gt=0, sample_rate=0.1)
+        @sa_string('b', sample_rate=0.5)
+        def _test(a, b=''):
+            return a
+
+        self.assertEqual(self._count_errors(_test, 100), 50)
+
+    def test_global_rate(self):
+        sampling.configure(rate=0.5)
+
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        # A rate given to the decorator overrides the global rate
+        @sa_int('a', gt=0, sample_rate=1)
+        def _test_all(a):
+            return a
+
+        self.assertEqual(self._count_errors(_test, 100), 50)
+        self.assertEqual(self._count_errors(_test_all, 100), 100)
+
+    def test_module_rate(self):
+        # Keyed on the name of this module, which is imported as test_sampling by unittest discover -s test/
+        package = __name__.rpartition('.')[0] or 'package'
+        sampling.configure(rate=0.5, modules={package: 0.1, __name__: 0.2, 'other': 1})
+
+        @sa_int('a', gt=0)
+        def _test(a):
+            return a
+
+        self.assertEqual(sampling.rate_for(__name__), 0.2)
+        self.assertEqual(sampling.rate_for(package + '.test_application'), 0.1)
+        self.assertEqual(sampling.rate_for('other.module'), 1)
+        self.assertEqual(sampling.rate_for('pytsa'), 0.5)
+        self.assertEqual(self._count_errors(_test, 100), 20)
+
+    def test_random_mode(self):
+        sampling.configure(rate=0.3, mode=sampling.RANDOM)
+        with mock.patch('random.random', side_effect=[0.1, 0.5, 0.29, 0.3]):
+            @sa_int('a', gt=0)
+            def _test(a):
+                return a
+
+            self.assertEqual(self._count_errors(_test, 4), 2)
+
+    def test_configure_checks_arguments(self):
+        with self.assertRaises(ValueError):
+            sampling.configure(rate=2)
+        with self.assertRaises(ValueError):
+            sampling.configure(modules={'test': -1})
+        with self.assertRaises(ValueError):
+            sampling.configure(rate=0.5, mode='sometimes')
+
+    def test_parse_modules(self):
+        self.assertEqual(sampling._parse_modules('a.b=0.1, a=0.5,'), {'a.b': 0.1, 'a': 0.5})
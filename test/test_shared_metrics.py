@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+from unittest import TestCase, skipUnless
+
+from pytsa import sa_int, profiling
+
+try:
+    from pytsa import shared_metrics
+except ImportError:
+    # multiprocessing.shared_memory is new in Python 3.8
+    shared_metrics = None
+
+
+@sa_int('a', gt=0)
+def _validated(a):
+    return a
+
+
+def _work(shared, calls):
+    shared.start_worker(interval=0.01)
+    for a in range(calls):
+        try:
+            _validated(a)
+        except ValueError:
+            pass
+
+
+@skipUnless(shared_metrics is not None, 'needs multiprocessing.shared_memory, new in Python 3.8')
+class TestSharedMetrics(TestCase):
+
+    def setUp(self):
+        self.shared = shared_metrics.SharedMetrics(slots=2, entries=8)
+        self.addCleanup(self.shared.unlink)
+        self.addCleanup(self.shared.close)
+
+    def tearDown(self):
+        profiling.stop()
+        profiling.reset()
+
+    def _run_workers(self, count, calls):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_work, args=(self.shared, calls)) for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+
+    @skipUnless('fork' in multiprocessing.get_all_start_methods(), 'needs fork')
+    def test_workers(self):
+        self._run_workers(2, 50)
+        stats = self.shared.stats()[__name__ + '._validated']
+        self.assertEqual((stats['calls'], stats['failures']), (100, 2))
+        self.assertEqual(stats['arguments']['a']['gt']['calls'], 100)
+        self.assertEqual(sum(stats['histogram'].values()), 100)
+
+        # The slots of workers which exited are taken by new workers, keeping the counters of the old ones
+        self._run_workers(2, 10)
+        stats = self.shared.stats()[__name__ + '._validated']
+        self.assertEqual((stats['calls'], stats['failures']), (120, 4))
+        self.assertIn('pytsa_validations_total{{function="{}._validated",parameter="a",rule="gt",outcome="fail"}} 4'
+                      .format(__name__), self.shared.render())
+
+    def test_worker_in_process(self):
+        self.shared.start_worker(interval=60)
+        _validated(1)
+        self.assertEqual(self.shared.stats(), {})
+        self.shared.flush()
+        self.assertEqual(self.shared.stats()[__name__ + '._validated']['calls'], 1)
+
+    def test_slots_taken(self):
+        # Both slots are taken by a process which is alive
+        self.shared._write(1, os.getppid(), {})
+        self.shared._write(2, os.getppid(), {})
+        with self.assertRaises(RuntimeError):
+            self.shared.start_worker()
+
+    def test_interrupted_write(self):
+        key = ('module.function', 'a', 'gt')
+        self.shared._write(1, os.getpid(), {key: [1, 0, 10, 10, profiling._new_entry()[profiling.HISTOGRAM]]})
+        self.assertEqual(self.shared._read(1)[1][key][:4], [1, 0, 10, 10])
+
+        # A worker which exits while writing its slot leaves it empty
+        context = multiprocessing.get_context()
+        process = context.Process(target=os.getpid)
+        process.start()
+        process.join()
+        offset = self.shared._offset(1)
+        shared_metrics._SLOT_HEADER.pack_into(self.shared.memory.buf, offset, process.pid, 1, 1)
+        self.assertEqual(self.shared._read(1), (process.pid, {}))
+
+    def test_key(self):
+        for key in [('module.function', 'a', 'gt+lt'), ('module.function', None, None)]:
+            self.assertEqual(shared_metrics._decode(shared_metrics._encode(key)), key)
+
+    def test_long_key(self):
+        # Keys which do not fit are shortened, but not merged with other keys sharing the same start
+        keys = [('module.' + 'f' * 300, 'a', 'gt'), ('module.' + 'f' * 301, 'a', 'gt'), ('module.f', 'a' * 300, 'gt'),
+                ('module.f', 'a' * 301, None)]
+        names = [shared_metrics._encode(key) for key in keys]
+        self.assertEqual(len(set(names)), len(keys))
+        for key, name in zip(keys, names):
+            self.assertLessEqual(len(name), shared_metrics._NAME_SIZE)
+            function, arg_name, rule = shared_metrics._decode(name)
+            self.assertTrue(function.startswith(key[0][:50]))
+            self.assertEqual(rule, key[2])
+
+        entry = [1, 0, 10, 10, profiling._new_entry()[profiling.HISTOGRAM]]
+        self.shared._write(1, os.getpid(), dict((key, entry) for key in keys))
+        self.assertEqual(len(self.shared.totals()), len(keys))
+
+    def test_retired_entries(self):
+        self.assertEqual(self.shared.retired_entries, 32)
+        histogram = profiling._new_entry()[profiling.HISTOGRAM]
+        counters = dict((('module.function{}'.format(index), 'a', 'gt'), [1, 0, 10, 10, histogram])
+                        for index in range(40))
+        self.shared._write(2, os.getpid(), {('module.function', 'a', 'gt'): [1, 0, 10, 10, histogram]})
+
+        # The retired slot holds more keys than a worker slot, and logs the counters it drops every time
+        for _ in range(2):
+            with self.assertLogs('pytsa', 'WARNING') as logs:
+                self.shared._write(shared_metrics._RETIRED, os.getpid(), counters)
+            self.assertIn('the counters of 8 are dropped', logs.output[0])
+        self.assertEqual(len(self.shared._read(shared_metrics._RETIRED)[1]), 32)
+        self.assertEqual(list(self.shared._read(2)[1]), [('module.function', 'a', 'gt')])
@@ -0,0 +1,201 @@
+import os
+import stat
+import sys
+import tempfile
+import time
+from os import path, chmod, remove
+from unittest import TestCase, mock, skipUnless
+
+from pytsa import sa_path, stat_cache
+from pytsa.stat_cache import StatCache
+from test.test_utils import test_boolean_parameter
+
+
+class TestStatCache(TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.test_files = []
+        for i in range(3):
+            test_file = path.join(self.test_dir, 'test{}.txt'.format(i))
+            with open(test_file, 'w') as f:
+                f.write('Temp test file')
+            self.test_files.append(test_file)
+
+    def test_no_ttl(self):
+        # Without a ttl nothing is cached
+        cache = StatCache()
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            cache.stat(self.test_dir)
+            cache.stat(self.test_dir)
+            self.assertEqual(os_stat.call_count, 2)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_ttl(self):
+        cache = StatCache(ttl=60)
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            self.assertEqual(cache.stat(self.test_dir), os.stat(self.test_dir))
+            cache.stat(self.test_dir)
+            self.assertEqual(os_stat.call_count, 2)
+
+            # A ttl given on lookup overrides the default
+            with mock.patch('time.monotonic', return_value=10 ** 9):
+                cache.stat(self.test_dir, ttl=1)
+            self.assertEqual(os_stat.call_count, 3)
+
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_errors_not_cached(self):
+        cache = StatCache(ttl=60)
+        with self.assertRaises(FileNotFoundError):
+            cache.stat(path.join(self.test_dir, 'non-existent.txt'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_lru_eviction(self):
+        cache = StatCache(ttl=60, maxsize=2)
+        cache.stat(self.test_files[0])
+        cache.stat(self.test_files[1])
+        cache.stat(self.test_files[0])
+        # test1.txt is least recently used, and is evicted
+        cache.stat(self.test_files[2])
+
+        self.assertEqual(cache.stats()['evictions'], 1)
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            cache.stat(self.test_files[0])
+            cache.stat(self.test_files[2])
+            self.assertEqual(os_stat.call_count, 0)
+            cache.stat(self.test_files[1])
+            self.assertEqual(os_stat.call_count, 1)
+
+    def test_clear(self):
+        cache = StatCache(ttl=60)
+        cache.stat(self.test_dir)
+        cache.clear()
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'size': 0,
+                                         'maxsize': 1024, 'watches': 0})
+
+
+    def _wait_for_invalidation(self, cache, invalidations):
+        deadline = time.monotonic() + 5
+        while cache.stats()['invalidations'] < invalidations and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cache.stats()['invalidations'], invalidations)
+
+    @skipUnless(sys.platform.startswith('linux'), 'inotify is only available on Linux')
+    def test_watch(self):
+        cache = StatCache(watch=True)
+        test_file = self.test_files[0]
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            cache.stat(test_file)
+            cache.stat(test_file)
+            self.assertEqual(os_stat.call_count, 1)
+        self.assertEqual(cache.stats()['watches'], 1)
+
+        # Changing the permissions invalidates the cached result
+        chmod(test_file, 0o0600)
+        self._wait_for_invalidation(cache, 1)
+        self.assertEqual(stat.S_IMODE(cache.stat(test_file).st_mode), 0o0600)
+
+        # As does removing the file
+        remove(test_file)
+        self._wait_for_invalidation(cache, 2)
+        with self.assertRaises(FileNotFoundError):
+            cache.stat(test_file)
+
+    @skipUnless(sys.platform.startswith('linux') and hasattr(os, 'fork'), 'inotify is only available on Linux')
+    def test_watch_after_fork(self):
+        cache = StatCache(watch=True)
+        test_file = self.test_files[0]
+        cache.stat(test_file)
+        pid = os.fork()
+        if pid == 0:
+            # The child watches with an inotify instance of its own, which sees the file being removed
+            code = 1
+            try:
+                cache.stat(test_file)
+                remove(test_file)
+                deadline = time.monotonic() + 5
+                while cache.stats()['invalidations'] < 1 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                try:
+                    cache.stat(test_file)
+                except FileNotFoundError:
+                    code = 0
+            finally:
+                os._exit(code)
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+
+    def test_relative_path(self):
+        # Relative paths are cached by their absolute path, another working directory stats them again
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        empty_dir = path.join(self.test_dir, 'empty')
+        os.mkdir(empty_dir)
+        for cache in [StatCache(ttl=60), StatCache(watch=True)]:
+            os.chdir(self.test_dir)
+            cache.stat('test0.txt')
+            os.chdir(empty_dir)
+            with self.assertRaises(FileNotFoundError):
+                cache.stat('test0.txt')
+
+    def test_watch_unavailable(self):
+        # Without inotify, the ttl is used instead
+        with mock.patch('pytsa._inotify.Inotify', side_effect=OSError('inotify is not available')):
+            cache = StatCache(watch=True)
+            with mock.patch('os.stat', wraps=os.stat) as os_stat:
+                cache.stat(self.test_dir)
+                cache.stat(self.test_dir)
+                cache.stat(self.test_dir, ttl=60)
+                cache.stat(self.test_dir, ttl=60)
+                self.assertEqual(os_stat.call_count, 3)
+
+
+class TestSaPathStatCache(TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        stat_cache.clear()
+
+    def tearDown(self):
+        stat_cache.configure(ttl=None)
+        stat_cache.clear()
+
+    def test_rule_stat_cache_ttl(self):
+        @sa_path('a', is_dir=True, can_owner_write=True, stat_cache_ttl=60)
+        def _test(a):
+            return a
+
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            _test(self.test_dir)
+            _test(self.test_dir)
+            self.assertEqual(os_stat.call_count, 1)
+        self.assertEqual(stat_cache.stats()['hits'], 1)
+
+    def test_rule_stat_cache_ttl_takes_positive_number(self):
+        with self.assertRaises(ValueError):
+            sa_path('a', stat_cache_ttl=0)
+        with self.assertRaises(ValueError):
+            sa_path('a', stat_cache_ttl=None)
+        with self.assertRaises(TypeError):
+            sa_path('a', stat_cache_ttl='60')
+
+    def test_rule_stat_cache_watch_takes_boolean(self):
+        test_boolean_parameter(self, sa_path, 'stat_cache_watch')
+
+    def test_global_ttl(self):
+        @sa_path('a', is_dir=True)
+        def _test(a):
+            return a
+
+        stat_cache.configure(ttl=60)
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            _test(self.test_dir)
+            _test(self.test_dir)
+            self.assertEqual(os_stat.call_count, 1)
+
+        # Disabling the global cache also applies to decorators applied before
+        stat_cache.configure(ttl=None)
+        with mock.patch('os.stat', wraps=os.stat) as os_stat:
+            _test(self.test_dir)
+            self.assertEqual(os_stat.call_count, 1)
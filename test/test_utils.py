@@ -1,3 +1,17 @@
+import asyncio
+
+
+def run(coroutine):
+    """Run a coroutine on a new event loop, like asyncio.run which is new in Python 3.7"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
 def none_checker(check_none, func):
     if check_none:
         def _checker(val):